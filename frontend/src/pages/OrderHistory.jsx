@@ -1,81 +1,106 @@
 import { useState, useEffect } from "react";
 import api from "../api";
 
+const PAGE_SIZE = 20;
+
 export default function OrderHistory() {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const fetchPage = async (cursor) => {
+    const userId = localStorage.getItem("userId");
+    if (!userId) return;
+
+    try {
+      // 1. Fetch one page of orders (newest first)
+      const ordersRes = await api.get(`/orders/${userId}`, {
+        params: { view: "full", limit: PAGE_SIZE, cursor: cursor || undefined },
+      });
+      const rawOrders = ordersRes.data.orders || [];
+      setNextCursor(ordersRes.data.next_cursor);
+
+      // 2. Parse each order's line items
+      // FIX A: Handle "items" being a JSON string or an Array
+      const parseItems = (order) => {
+        if (typeof order.items === "string") {
+          try {
+            return JSON.parse(order.items);
+          } catch (e) {
+            console.error("Failed to parse items JSON", e);
+            return [];
+          }
+        }
+        return Array.isArray(order.items) ? order.items : [];
+      };
+      const orderItems = rawOrders.map(parseItems);
 
-  useEffect(() => {
-    const fetchData = async () => {
-      const userId = localStorage.getItem("userId");
-      if (!userId) return;
-
+      // 3. Fetch the ordered products in batch calls to lookup the names
+      let productMap = {};
       try {
-        // 1. Fetch the raw orders
-        const ordersRes = await api.get(`/orders/${userId}`);
-        const rawOrders = ordersRes.data;
-
-        // 2. Fetch products to lookup the names (So video looks good!)
-        // We get a list of all items to match IDs to Captions
-        let productMap = {};
-        try {
-          const productsRes = await api.get("/search?q=item&limit=100");
-          const productList = productsRes.data.results || [];
+        const itemIds = [
+          ...new Set(
+            orderItems.flat().map((item) => item.itemId || item.item_id),
+          ),
+        ];
+        // The batch endpoint accepts up to 100 IDs per call
+        for (let i = 0; i < itemIds.length; i += 100) {
+          const productsRes = await api.post("/items:batchGet", {
+            item_ids: itemIds.slice(i, i + 100),
+          });
           // Create a dictionary: { "1": "Cloud Computing...", "2": "Clean Code..." }
-          productList.forEach((p) => {
+          (productsRes.data.items || []).forEach((p) => {
             productMap[p.item_id] = p.description;
           });
-        } catch (e) {
-          console.warn("Could not fetch product details for history");
         }
-
-        // 3. Process the Orders (Fixing the Crash)
-        const safeOrders = rawOrders.map((order) => {
-          let parsedItems = [];
-
-          // FIX A: Handle "items" being a JSON string or an Array
-          if (typeof order.items === "string") {
-            try {
-              parsedItems = JSON.parse(order.items);
-            } catch (e) {
-              console.error("Failed to parse items JSON", e);
-            }
-          } else if (Array.isArray(order.items)) {
-            parsedItems = order.items;
-          }
-
-          // FIX B: Map IDs to Captions
-          const enrichedItems = parsedItems.map((item) => ({
-            ...item,
-            // Use the map we built, or fallback to the ID
-            caption:
-              productMap[item.itemId || item.item_id] ||
-              item.description ||
-              `Item #${item.itemId}`,
-          }));
-
-          return {
-            ...order,
-            items: enrichedItems,
-            // FIX C: Handle 'total_amount' vs 'total'
-            total:
-              order.total_amount !== undefined
-                ? parseFloat(order.total_amount)
-                : parseFloat(order.total || 0),
-          };
-        });
-
-        setOrders(safeOrders);
-      } catch (err) {
-        console.error("Error fetching history:", err);
-      } finally {
-        setLoading(false);
+      } catch (e) {
+        console.warn("Could not fetch product details for history");
       }
-    };
 
-    fetchData();
+      // 4. Process the Orders (Fixing the Crash)
+      const safeOrders = rawOrders.map((order, index) => {
+        const parsedItems = orderItems[index];
+
+        // FIX B: Map IDs to Captions
+        const enrichedItems = parsedItems.map((item) => ({
+          ...item,
+          // Use the map we built, or fallback to the ID
+          caption:
+            productMap[item.itemId || item.item_id] ||
+            item.description ||
+            `Item #${item.itemId}`,
+        }));
+
+        return {
+          ...order,
+          items: enrichedItems,
+          // FIX C: Handle 'total_amount' vs 'total'
+          total:
+            order.total_amount !== undefined
+              ? parseFloat(order.total_amount)
+              : parseFloat(order.total || 0),
+        };
+      });
+
+      setOrders((previous) =>
+        cursor ? [...previous, ...safeOrders] : safeOrders,
+      );
+    } catch (err) {
+      console.error("Error fetching history:", err);
+    }
+  };
+
+  useEffect(() => {
+    fetchPage(null).finally(() => setLoading(false));
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchPage(nextCursor);
+    setLoadingMore(false);
+  };
+
   if (loading)
     return (
       <p style={{ textAlign: "center", marginTop: "20px" }}>
@@ -193,6 +218,15 @@ export default function OrderHistory() {
               </div>
             </div>
           ))}
+          {nextCursor && (
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              style={{ alignSelf: "center" }}
+            >
+              {loadingMore ? "Loading..." : "Load more orders"}
+            </button>
+          )}
         </div>
       )}
     </div>
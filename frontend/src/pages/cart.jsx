@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import api from "../api";
 
@@ -6,6 +6,8 @@ export default function Cart() {
   const [cartItems, setCartItems] = useState([]);
   const [loading, setLoading] = useState(true);
   const [totalPrice, setTotalPrice] = useState(0);
+  // Reused when a failed checkout is retried so it can't place two orders
+  const orderKey = useRef(null);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -21,17 +23,21 @@ export default function Cart() {
         const cartRes = await api.get(`/cart/${userId}`);
         const rawItems = cartRes.data.items || [];
 
-        // 2. Fetch the Product Catalog (To get Names)
+        // 2. Fetch the cart's products in one batch call (To get Names)
         let productMap = {};
         try {
-          // Fetch enough items to cover the IDs
-          const productsRes = await api.get("/search?q=item&limit=100");
-          const productList = productsRes.data.results || [];
+          const itemIds = rawItems.map((item) => item.itemId);
+          if (itemIds.length > 0) {
+            const productsRes = await api.post("/items:batchGet", {
+              item_ids: itemIds,
+            });
+            const productList = productsRes.data.items || [];
 
-          // Create a "Dictionary" for fast lookup
-          productList.forEach((p) => {
-            productMap[p.item_id] = p.description;
-          });
+            // Create a "Dictionary" for fast lookup
+            productList.forEach((p) => {
+              productMap[p.item_id] = p.description;
+            });
+          }
         } catch (e) {
           console.warn("Could not fetch catalog for name lookup");
         }
@@ -99,13 +105,24 @@ export default function Cart() {
 
     if (window.confirm(`Confirm purchase for $${totalPrice.toFixed(2)}?`)) {
       try {
-        await api.post(`/orders/${userId}/place`);
+        if (!orderKey.current) orderKey.current = crypto.randomUUID();
+        await api.post(`/orders/${userId}/place`, null, {
+          headers: { "Idempotency-Key": orderKey.current },
+        });
+        orderKey.current = null;
 
         alert("Order placed successfully!");
         setCartItems([]);
         navigate("/orders");
       } catch (err) {
         console.error("Order failed:", err);
+        const detail = err.response?.data?.detail;
+        if (err.response?.status === 409 && detail?.message) {
+          // The cart was put back at current catalog prices; show them
+          alert(`${detail.message}. Please review your cart.`);
+          window.location.reload();
+          return;
+        }
         alert("Failed to place order.");
       }
     }
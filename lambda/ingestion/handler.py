@@ -1,18 +1,28 @@
+import hashlib
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import boto3
 import psycopg2
-from sentence_transformers import SentenceTransformer
-from PIL import Image
-import io
-import requests
-from opensearchpy import OpenSearch, RequestsHttpConnection
+from psycopg2.extras import execute_values
+from opensearchpy import OpenSearch, RequestsHttpConnection, helpers
 from datetime import datetime
+from decimal import Decimal
+
+from embeddings import (
+    DEFAULT_MODEL_NAME,
+    load_embedding_model,
+    model_key,
+    vector_to_bytes,
+)
+from images import ImageStage, parse_sizes
 
 # Initialize clients and model
 s3_client = boto3.client("s3")
 model = None
 opensearch_client = None
+image_stage = None
 
 # Environment variables
 RDS_HOST = os.environ["RDS_HOST"]
@@ -25,6 +35,56 @@ OPENSEARCH_ENDPOINT = os.environ["OPENSEARCH_ENDPOINT"]
 OPENSEARCH_USERNAME = os.environ["OPENSEARCH_USERNAME"]
 OPENSEARCH_PASSWORD = os.environ["OPENSEARCH_PASSWORD"]
 
+# Must match search-service so query and item vectors are comparable
+MODEL_NAME = os.environ.get("MODEL_NAME", DEFAULT_MODEL_NAME)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.environ.get("EMBEDDING_ONNX_FILE")
+MODEL_KEY = model_key(MODEL_NAME, EMBEDDING_BACKEND)
+
+# "batch" embeds, upserts and indexes all records of an event together;
+# "single" keeps the original one-record-at-a-time path
+INGESTION_MODE = os.environ.get("INGESTION_MODE", "batch")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+
+# Concurrent image downloads/uploads, and optional thumbnail edge sizes
+# (e.g. "512,256,128") written under thumbnails/<size>/
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "8"))
+THUMBNAIL_SIZES = parse_sizes(os.environ.get("THUMBNAIL_SIZES"))
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "EcommerceIngestion")
+
+REQUIRED_FIELDS = ["item_id", "description", "image_url", "price"]
+
+UPSERT_ITEMS_SQL = """
+    INSERT INTO items (item_id, description, image_url, s3_image_key, price, content_hash)
+    VALUES %s
+    ON CONFLICT (item_id) DO UPDATE
+    SET description = EXCLUDED.description,
+        image_url = EXCLUDED.image_url,
+        s3_image_key = EXCLUDED.s3_image_key,
+        price = EXCLUDED.price,
+        content_hash = EXCLUDED.content_hash,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+UPSERT_VECTORS_SQL = """
+    INSERT INTO item_vectors (item_id, model_name, dim, embedding)
+    VALUES %s
+    ON CONFLICT (item_id, model_name) DO UPDATE
+    SET dim = EXCLUDED.dim,
+        embedding = EXCLUDED.embedding,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+UPDATE_PRICES_SQL = """
+    UPDATE items
+    SET price = data.price::numeric,
+        content_hash = data.content_hash,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (VALUES %s) AS data (item_id, price, content_hash)
+    WHERE items.item_id = data.item_id
+"""
+
 
 def get_db_connection():
     """Create database connection"""
@@ -48,13 +108,8 @@ def get_opensearch_client():
     return opensearch_client
 
 
-def store_in_opensearch(
-    item_id, description, price, image_url, s3_image_key, embedding
-):
-    """Store item with embedding in OpenSearch"""
-    client = get_opensearch_client()
-
-    document = {
+def build_document(item_id, description, price, image_url, s3_image_key, embedding):
+    return {
         "item_id": item_id,
         "description": description,
         "price": price,
@@ -64,6 +119,17 @@ def store_in_opensearch(
         "created_at": datetime.utcnow().isoformat(),
     }
 
+
+def store_in_opensearch(
+    item_id, description, price, image_url, s3_image_key, embedding
+):
+    """Store item with embedding in OpenSearch"""
+    client = get_opensearch_client()
+
+    document = build_document(
+        item_id, description, price, image_url, s3_image_key, embedding
+    )
+
     try:
         response = client.index(index="items", id=item_id, body=document, refresh=True)
         print(f"Item indexed in OpenSearch: {item_id}, result: {response['result']}")
@@ -77,48 +143,29 @@ def load_model():
     """Load BERT model (cached after first invocation)"""
     global model
     if model is None:
-        print("Loading BERT model...")
-        model = SentenceTransformer(
-            "sentence-transformers/all-MiniLM-L6-v2",
-        )
+        print(f"Loading BERT model ({EMBEDDING_BACKEND} backend)...")
+        model = load_embedding_model(MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_ONNX_FILE)
         print("Model loaded successfully")
     return model
 
 
-def download_and_store_image(image_url, item_id):
-    """Download image from URL and store in S3"""
-    try:
-        print(f"Downloading image from {image_url}")
-        response = requests.get(image_url, timeout=10, stream=True)
-        response.raise_for_status()
-
-        # Open and verify image
-        img = Image.open(io.BytesIO(response.content))
-
-        # Convert to RGB if necessary (handle RGBA, grayscale, etc.)
-        if img.mode != "RGB":
-            img = img.convert("RGB")
-
-        # Save to buffer
-        buffer = io.BytesIO()
-        img.save(buffer, format="JPEG", quality=85)
-        buffer.seek(0)
-
-        # Upload to S3
-        s3_key = f"{item_id}.jpg"
-        s3_client.put_object(
-            Bucket=IMAGES_BUCKET, Key=s3_key, Body=buffer, ContentType="image/jpeg"
+def get_image_stage():
+    """Image stage with a pooled HTTP session (reused across invocations)"""
+    global image_stage
+    if image_stage is None:
+        image_stage = ImageStage(
+            s3_client,
+            IMAGES_BUCKET,
+            workers=IMAGE_WORKERS,
+            thumbnail_sizes=THUMBNAIL_SIZES,
         )
+    return image_stage
 
-        print(f"Image stored at s3://{IMAGES_BUCKET}/{s3_key}")
-        return s3_key
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error downloading image: {e}")
-        return None
-    except Exception as e:
-        print(f"Error processing image: {e}")
-        return None
+def download_and_store_image(image_url, item_id):
+    """Download image from URL and store in S3"""
+    print(f"Downloading image from {image_url}")
+    return get_image_stage().process_one(item_id, image_url)
 
 
 def generate_embedding(text):
@@ -129,6 +176,47 @@ def generate_embedding(text):
     return embedding.squeeze().tolist()
 
 
+def bump_catalog_version(conn):
+    """Signal search-service to drop cached results for the old catalog"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE catalog_version
+            SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = 1
+            """
+        )
+    conn.commit()
+
+
+def vector_row(item_id, embedding):
+    return (
+        item_id,
+        MODEL_KEY,
+        len(embedding),
+        psycopg2.Binary(vector_to_bytes(embedding)),
+    )
+
+
+def content_hash(item_data):
+    """Hash of the fields that everything else about an item is derived from"""
+    price = Decimal(str(item_data["price"])).quantize(Decimal("0.01"))
+    payload = json.dumps(
+        [item_data["description"], str(price), item_data["image_url"]]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def forget_hashes(conn, item_ids):
+    """Clear stored hashes of items that failed to index so a rerun retries them"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE items SET content_hash = NULL WHERE item_id = ANY(%s)",
+            (list(item_ids),),
+        )
+    conn.commit()
+
+
 def store_item_in_db(item_data, s3_image_key, embedding):
     """Store item in RDS PostgreSQL"""
     conn = get_db_connection()
@@ -137,13 +225,16 @@ def store_item_in_db(item_data, s3_image_key, embedding):
             # Insert into items table
             cur.execute(
                 """
-                INSERT INTO items (item_id, description, image_url, s3_image_key, price)
-                VALUES (%s, %s, %s, %s, %s)
+                INSERT INTO items
+                    (item_id, description, image_url, s3_image_key, price, content_hash)
+                VALUES (%s, %s, %s, %s, %s, %s)
                 ON CONFLICT (item_id) DO UPDATE
                 SET description = EXCLUDED.description,
                     image_url = EXCLUDED.image_url,
                     s3_image_key = EXCLUDED.s3_image_key,
-                    price = EXCLUDED.price
+                    price = EXCLUDED.price,
+                    content_hash = EXCLUDED.content_hash,
+                    updated_at = CURRENT_TIMESTAMP
             """,
                 (
                     item_data["item_id"],
@@ -151,21 +242,29 @@ def store_item_in_db(item_data, s3_image_key, embedding):
                     item_data["image_url"],
                     s3_image_key,
                     item_data["price"],
+                    content_hash(item_data),
                 ),
             )
+            execute_values(
+                cur, UPSERT_VECTORS_SQL, [vector_row(item_data["item_id"], embedding)]
+            )
 
         conn.commit()
         print(f"Item {item_data['item_id']} stored in database")
 
         # Store in OpenSearch
-        store_in_opensearch(
+        if not store_in_opensearch(
             item_data["item_id"],
             item_data["description"],
             item_data["price"],
             item_data["image_url"],
             s3_image_key,
             embedding,
-        )
+        ):
+            forget_hashes(conn, [item_data["item_id"]])
+
+        # Bump only after the document is searchable
+        bump_catalog_version(conn)
 
     except Exception as e:
         conn.rollback()
@@ -175,6 +274,360 @@ def store_item_in_db(item_data, s3_image_key, embedding):
         conn.close()
 
 
+def validate_item(item_data):
+    for field in REQUIRED_FIELDS:
+        if field not in item_data:
+            raise ValueError(f"Missing required field: {field}")
+
+
+def load_object(bucket, key):
+    """Item documents in an S3 object: one JSON item, or a JSONL manifest"""
+    response = s3_client.get_object(Bucket=bucket, Key=key)
+    body = response["Body"].read().decode("utf-8")
+    if key.endswith(".jsonl"):
+        return [
+            (f"{key}:{lineno}", line)
+            for lineno, line in enumerate(body.splitlines(), 1)
+            if line.strip()
+        ]
+    return [(key, body)]
+
+
+def read_items(event, failures):
+    """Load and validate the items of every S3 record in the event"""
+    items = []
+    for record in event["Records"]:
+        bucket = record["s3"]["bucket"]["name"]
+        key = record["s3"]["object"]["key"]
+        try:
+            documents = load_object(bucket, key)
+        except Exception as e:
+            print(f"Skipping s3://{bucket}/{key}: {e}")
+            failures.append({"key": key, "stage": "read", "error": str(e)})
+            continue
+
+        for source, document in documents:
+            try:
+                item_data = json.loads(document)
+                validate_item(item_data)
+                items.append(item_data)
+            except Exception as e:
+                print(f"Skipping {source}: {e}")
+                failures.append({"key": source, "stage": "read", "error": str(e)})
+    return items
+
+
+def generate_embeddings(texts):
+    """Generate BERT embeddings for many texts in one batched model call"""
+    model = load_model()
+    embeddings = model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE)
+    return [embedding.tolist() for embedding in embeddings]
+
+
+def classify_items(conn, items):
+    """Split items into (unchanged, price_only, changed) against stored rows.
+
+    Items without a stored vector for the current model are always
+    changed, so switching models re-embeds them, and so are items whose
+    hash was cleared by forget_hashes: their OpenSearch document may never
+    have been written, so a partial price update would fail forever.
+    Items stored without an S3 key (the image failed) are changed too, so
+    the image is fetched again. Changed items whose image URL is unchanged
+    keep their stored S3 key so the image isn't fetched again.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT i.item_id, i.content_hash, i.description, i.image_url,
+                   i.s3_image_key, v.item_id IS NOT NULL
+            FROM items i
+            LEFT JOIN item_vectors v
+                ON v.item_id = i.item_id AND v.model_name = %s
+            WHERE i.item_id = ANY(%s)
+            """,
+            (MODEL_KEY, [item["item_id"] for item in items]),
+        )
+        existing = {row[0]: row[1:] for row in cur.fetchall()}
+
+    unchanged, price_only, changed = [], [], []
+    for item in items:
+        item["content_hash"] = content_hash(item)
+        item["s3_image_key"] = None
+        if item["item_id"] not in existing:
+            changed.append(item)
+            continue
+
+        stored_hash, description, image_url, s3_image_key, has_vector = existing[
+            item["item_id"]
+        ]
+        indexed = has_vector and stored_hash is not None and s3_image_key is not None
+        if indexed and stored_hash == item["content_hash"]:
+            unchanged.append(item)
+        elif (
+            indexed
+            and description == item["description"]
+            and image_url == item["image_url"]
+        ):
+            price_only.append(item)
+        else:
+            if image_url == item["image_url"]:
+                item["s3_image_key"] = s3_image_key
+            changed.append(item)
+    return unchanged, price_only, changed
+
+
+def write_rows(conn, statements, items, failures):
+    """Run each (sql, rows) statement as one multi-row write, in one transaction.
+
+    Every statement has one row per item. If the batch is rejected, retry
+    item by item so one bad item doesn't fail the rest. Returns the items
+    that were written.
+    """
+    try:
+        with conn.cursor() as cur:
+            for sql, rows in statements:
+                execute_values(cur, sql, rows, page_size=500)
+        conn.commit()
+        return items
+    except Exception as e:
+        conn.rollback()
+        print(f"Batch write failed ({e}), retrying items individually")
+
+    written = []
+    for i, item in enumerate(items):
+        try:
+            with conn.cursor() as cur:
+                for sql, rows in statements:
+                    execute_values(cur, sql, [rows[i]])
+            conn.commit()
+            written.append(item)
+        except Exception as e:
+            conn.rollback()
+            failures.append(
+                {"item_id": item["item_id"], "stage": "database", "error": str(e)}
+            )
+    return written
+
+
+def store_items_in_db(conn, items, failures):
+    rows = [
+        (
+            item["item_id"],
+            item["description"],
+            item["image_url"],
+            item["s3_image_key"],
+            item["price"],
+            item["content_hash"],
+        )
+        for item in items
+    ]
+    vectors = [vector_row(item["item_id"], item["embedding"]) for item in items]
+    return write_rows(
+        conn, [(UPSERT_ITEMS_SQL, rows), (UPSERT_VECTORS_SQL, vectors)], items, failures
+    )
+
+
+def update_prices_in_db(conn, items, failures):
+    rows = [(item["item_id"], item["price"], item["content_hash"]) for item in items]
+    return write_rows(conn, [(UPDATE_PRICES_SQL, rows)], items, failures)
+
+
+def run_bulk(actions, failures):
+    """Send actions through the _bulk API, without forcing a refresh.
+
+    Returns the ids of documents that failed.
+    """
+    _, errors = helpers.bulk(
+        get_opensearch_client(),
+        actions,
+        chunk_size=500,
+        raise_on_error=False,
+        raise_on_exception=False,
+    )
+    failed = set()
+    for error in errors:
+        info = next(iter(error.values()))
+        failed.add(info.get("_id"))
+        failures.append(
+            {
+                "item_id": info.get("_id"),
+                "stage": "opensearch",
+                "error": str(info.get("error")),
+            }
+        )
+    return failed
+
+
+def bulk_index_items(items, failures):
+    actions = [
+        {
+            "_op_type": "index",
+            "_index": "items",
+            "_id": item["item_id"],
+            "_source": build_document(
+                item["item_id"],
+                item["description"],
+                item["price"],
+                item["image_url"],
+                item["s3_image_key"],
+                item["embedding"],
+            ),
+        }
+        for item in items
+    ]
+    return run_bulk(actions, failures)
+
+
+def bulk_update_prices(items, failures):
+    """Partial document updates; the stored embedding is left untouched"""
+    actions = [
+        {
+            "_op_type": "update",
+            "_index": "items",
+            "_id": item["item_id"],
+            "doc": {"price": item["price"]},
+        }
+        for item in items
+    ]
+    return run_bulk(actions, failures)
+
+
+def embed_and_fetch_images(items, failures):
+    # Image I/O overlaps with the (CPU-bound) embedding of the batch
+    to_fetch = [
+        (item["item_id"], item["image_url"]) for item in items if not item["s3_image_key"]
+    ]
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        print(f"Fetching {len(to_fetch)} images...")
+        images = pool.submit(get_image_stage().process, to_fetch)
+
+        print(f"Generating embeddings for {len(items)} items...")
+        embeddings = generate_embeddings([item["description"] for item in items])
+        s3_keys = images.result()
+
+    for item, embedding in zip(items, embeddings):
+        item["embedding"] = embedding
+        if item["item_id"] in s3_keys:
+            item["s3_image_key"] = s3_keys[item["item_id"]]
+            if item["s3_image_key"] is None:
+                # Still stored and indexed, without an image; the NULL key
+                # makes the next run fetch it again
+                failures.append(
+                    {
+                        "item_id": item["item_id"],
+                        "stage": "image",
+                        "error": f"could not store image from {item['image_url']}",
+                    }
+                )
+
+
+def emit_counts(counts):
+    """Log counts in CloudWatch embedded metric format"""
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRICS_NAMESPACE,
+                            "Dimensions": [[]],
+                            "Metrics": [
+                                {"Name": name, "Unit": "Count"} for name in counts
+                            ],
+                        }
+                    ],
+                },
+                **counts,
+            }
+        )
+    )
+
+
+def process_batch(items, failures):
+    """Store and index a batch of items, doing only the work their changes need.
+
+    Returns counts of skipped, partial (price-only) and full updates.
+    """
+    # Later records for the same item win, as they would sequentially
+    items = list({item["item_id"]: item for item in items}.values())
+
+    conn = get_db_connection()
+    try:
+        unchanged, price_only, changed = classify_items(conn, items)
+
+        failed_ids = set()
+        full = partial = 0
+        if changed:
+            embed_and_fetch_images(changed, failures)
+            stored = store_items_in_db(conn, changed, failures)
+            if stored:
+                failed = bulk_index_items(stored, failures)
+                failed_ids |= failed
+                full = len(stored) - len(failed)
+        if price_only:
+            stored = update_prices_in_db(conn, price_only, failures)
+            if stored:
+                failed = bulk_update_prices(stored, failures)
+                failed_ids |= failed
+                partial = len(stored) - len(failed)
+
+        if failed_ids:
+            forget_hashes(conn, failed_ids)
+        if full or partial:
+            # Bump once per batch, after the documents are indexed
+            bump_catalog_version(conn)
+    finally:
+        conn.close()
+
+    counts = {
+        "ItemsSkipped": len(unchanged),
+        "ItemsPartial": partial,
+        "ItemsFull": full,
+        "ItemsFailed": len(failures),
+    }
+    emit_counts(counts)
+    return {
+        "processed": full + partial,
+        "skipped": len(unchanged),
+        "partial": partial,
+        "full": full,
+    }
+
+
+def process_item(item_data):
+    # Validate required fields
+    validate_item(item_data)
+
+    # Download and store image
+    s3_image_key = download_and_store_image(
+        item_data["image_url"], item_data["item_id"]
+    )
+
+    # Generate embedding from description
+    print("Generating embedding...")
+    embedding = generate_embedding(item_data["description"])
+    print(f"Embedding generated: dimension={len(embedding)}")
+
+    # Store in database
+    store_item_in_db(item_data, s3_image_key, embedding)
+
+    print(f"Successfully processed item {item_data['item_id']}")
+
+
+def process_records_individually(event):
+    for record in event["Records"]:
+        bucket = record["s3"]["bucket"]["name"]
+        key = record["s3"]["object"]["key"]
+
+        print(f"Processing s3://{bucket}/{key}")
+
+        # Get JSON file (or JSONL manifest) from S3
+        for _, document in load_object(bucket, key):
+            item_data = json.loads(document)
+            process_item(item_data)
+
+
 def lambda_handler(event, context):
     """
     Lambda handler triggered by S3 upload
@@ -185,43 +638,26 @@ def lambda_handler(event, context):
         "image_url": "https://example.com/image.jpg",
         "price": 29.99
     }
+    In batch mode, per-item failures are listed in the response body
+    instead of failing the whole event.
     """
     print(f"Received event: {json.dumps(event)}")
 
     try:
-        # Parse S3 event
-        for record in event["Records"]:
-            bucket = record["s3"]["bucket"]["name"]
-            key = record["s3"]["object"]["key"]
-
-            print(f"Processing s3://{bucket}/{key}")
-
-            # Get JSON file from S3
-            response = s3_client.get_object(Bucket=bucket, Key=key)
-            item_data = json.loads(response["Body"].read().decode("utf-8"))
-
-            # Validate required fields
-            required_fields = ["item_id", "description", "image_url", "price"]
-            for field in required_fields:
-                if field not in item_data:
-                    raise ValueError(f"Missing required field: {field}")
-
-            # Download and store image
-            s3_image_key = download_and_store_image(
-                item_data["image_url"], item_data["item_id"]
-            )
-
-            # Generate embedding from description
-            print("Generating embedding...")
-            embedding = generate_embedding(item_data["description"])
-            print(f"Embedding generated: dimension={len(embedding)}")
-
-            # Store in database
-            store_item_in_db(item_data, s3_image_key, embedding)
-
-            print(f"Successfully processed item {item_data['item_id']}")
-
-        return {"statusCode": 200, "body": json.dumps("Items processed successfully")}
+        if INGESTION_MODE == "single":
+            process_records_individually(event)
+            return {
+                "statusCode": 200,
+                "body": json.dumps("Items processed successfully"),
+            }
+
+        failures = []
+        items = read_items(event, failures)
+        summary = process_batch(items, failures) if items else {"processed": 0}
+        return {
+            "statusCode": 200,
+            "body": json.dumps({**summary, "failed": failures}),
+        }
 
     except Exception as e:
         print(f"Error processing event: {e}")
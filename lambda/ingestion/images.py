@@ -0,0 +1,141 @@
+"""Concurrent image download / transcode / upload stage for ingestion.
+
+Downloads share one pooled requests.Session and run on a bounded thread
+pool together with decoding, resizing and the S3 uploads, so a batch
+costs roughly its slowest images instead of the sum of all of them.
+Each image is decoded once; the full-size JPEG and any thumbnails are
+derived from the same bitmap.
+
+The S3 client only needs `put_object`, so any stand-in with that method
+works for local runs (see load-testing/image_stage_bench.py).
+"""
+
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+JPEG_QUALITY = 85
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """Session whose connection pool is large enough for every worker"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def parse_sizes(value: Optional[str]) -> Tuple[int, ...]:
+    """"512,128" -> (512, 128); empty or unset disables thumbnails"""
+    if not value:
+        return ()
+    return tuple(int(size) for size in value.split(",") if size.strip())
+
+
+def image_key(item_id) -> str:
+    return f"{item_id}.jpg"
+
+
+def thumbnail_key(item_id, size: int) -> str:
+    return f"thumbnails/{size}/{item_id}.jpg"
+
+
+def _encode_jpeg(img: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def transcode(data: bytes, thumbnail_sizes: Sequence[int] = ()):
+    """Decode once and return (jpeg bytes, {size: thumbnail jpeg bytes})"""
+    img = Image.open(io.BytesIO(data))
+
+    # Convert to RGB if necessary (handle RGBA, grayscale, etc.)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    full = _encode_jpeg(img)
+
+    # Shrink largest-first so each thumbnail starts from the previous one
+    thumbnails = {}
+    current = img
+    for size in sorted(set(thumbnail_sizes), reverse=True):
+        current = current.copy()
+        current.thumbnail((size, size))
+        thumbnails[size] = _encode_jpeg(current)
+    return full, thumbnails
+
+
+class ImageStage:
+    def __init__(
+        self,
+        s3_client,
+        bucket: str,
+        workers: int = 8,
+        thumbnail_sizes: Sequence[int] = (),
+        timeout: float = 10,
+        session: Optional[requests.Session] = None,
+    ):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.workers = max(1, workers)
+        self.thumbnail_sizes = tuple(thumbnail_sizes)
+        self.timeout = timeout
+        self.session = session or make_session(self.workers)
+
+    def _download(self, image_url: str) -> bytes:
+        with self.session.get(image_url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            buffer = io.BytesIO()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                buffer.write(chunk)
+                if buffer.tell() > MAX_IMAGE_BYTES:
+                    raise ValueError(f"Image larger than {MAX_IMAGE_BYTES} bytes")
+            return buffer.getvalue()
+
+    def _upload(self, key: str, body: bytes):
+        self.s3_client.put_object(
+            Bucket=self.bucket, Key=key, Body=body, ContentType="image/jpeg"
+        )
+
+    def process_one(self, item_id, image_url: str) -> Optional[str]:
+        """Download, transcode and store one image; returns the S3 key or None"""
+        try:
+            data = self._download(image_url)
+            full, thumbnails = transcode(data, self.thumbnail_sizes)
+
+            s3_key = image_key(item_id)
+            self._upload(s3_key, full)
+            for size, body in thumbnails.items():
+                self._upload(thumbnail_key(item_id, size), body)
+
+            print(f"Image stored at s3://{self.bucket}/{s3_key}")
+            return s3_key
+
+        except requests.exceptions.RequestException as e:
+            print(f"Error downloading image for item {item_id}: {e}")
+            return None
+        except Exception as e:
+            print(f"Error processing image for item {item_id}: {e}")
+            return None
+
+    def process(self, images: Iterable[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+        """Handle (item_id, image_url) pairs concurrently; returns {item_id: s3_key}"""
+        images = list(images)
+        if not images:
+            return {}
+        with ThreadPoolExecutor(
+            max_workers=min(self.workers, len(images)),
+            thread_name_prefix="image",
+        ) as pool:
+            keys = pool.map(lambda pair: self.process_one(*pair), images)
+            return {item_id: key for (item_id, _), key in zip(images, keys)}
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# handler reads these at import time
+for name in (
+    "RDS_HOST",
+    "RDS_DATABASE",
+    "RDS_USER",
+    "RDS_PASSWORD",
+    "IMAGES_BUCKET",
+    "OPENSEARCH_ENDPOINT",
+    "OPENSEARCH_USERNAME",
+    "OPENSEARCH_PASSWORD",
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
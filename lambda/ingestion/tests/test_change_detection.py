@@ -0,0 +1,194 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("opensearchpy")
+pytest.importorskip("sentence_transformers")
+
+import handler  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if "content_hash = NULL" in sql:
+            for item_id in params[0]:
+                self.rows[item_id]["content_hash"] = None
+        elif sql.lstrip().startswith("SELECT"):
+            _, item_ids = params
+            self.result = [
+                (
+                    item_id,
+                    row["content_hash"],
+                    row["description"],
+                    row["image_url"],
+                    row["s3_image_key"],
+                    row["has_vector"],
+                )
+                for item_id, row in self.rows.items()
+                if item_id in item_ids
+            ]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    """Just the items/item_vectors state classify_items and forget_hashes use"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def cursor(self):
+        return FakeCursor(self.rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeImageStage:
+    def __init__(self, calls, failing):
+        self.calls = calls
+        self.failing = failing
+
+    def process(self, pairs):
+        self.calls["image"].extend(item_id for item_id, _ in pairs)
+        return {
+            item_id: None if item_id in self.failing else f"images/{item_id}.jpg"
+            for item_id, _ in pairs
+        }
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    conn = FakeConnection()
+    calls = {"full": [], "price": [], "image": []}
+    index_failures = set()
+    image_failures = set()
+
+    def store(conn_, items, failures):
+        for item in items:
+            conn.rows[item["item_id"]] = {
+                "content_hash": item["content_hash"],
+                "description": item["description"],
+                "image_url": item["image_url"],
+                "s3_image_key": item["s3_image_key"],
+                "has_vector": True,
+            }
+        return items
+
+    def index(items, failures):
+        calls["full"].extend(item["item_id"] for item in items)
+        return {item["item_id"] for item in items} & index_failures
+
+    def update_prices(items, failures):
+        calls["price"].extend(item["item_id"] for item in items)
+        return {item["item_id"] for item in items} & index_failures
+
+    monkeypatch.setattr(handler, "get_db_connection", lambda: conn)
+    monkeypatch.setattr(
+        handler, "get_image_stage", lambda: FakeImageStage(calls, image_failures)
+    )
+    monkeypatch.setattr(
+        handler, "generate_embeddings", lambda texts: [[0.0] * 4 for _ in texts]
+    )
+    monkeypatch.setattr(handler, "store_items_in_db", store)
+    monkeypatch.setattr(handler, "update_prices_in_db", lambda c, items, f: items)
+    monkeypatch.setattr(handler, "bulk_index_items", index)
+    monkeypatch.setattr(handler, "bulk_update_prices", update_prices)
+    monkeypatch.setattr(handler, "bump_catalog_version", lambda c: None)
+    monkeypatch.setattr(handler, "emit_counts", lambda counts: None)
+    return conn, calls, index_failures, image_failures
+
+
+def make_item(price="9.99"):
+    return {
+        "item_id": "item-1",
+        "description": "Blue kettle",
+        "image_url": "https://example.com/kettle.jpg",
+        "price": price,
+    }
+
+
+def test_unchanged_item_is_skipped(pipeline):
+    conn, calls, _, _ = pipeline
+    handler.process_batch([make_item()], [])
+    result = handler.process_batch([make_item()], [])
+    assert result["skipped"] == 1
+    assert calls["full"] == ["item-1"]
+
+
+def test_price_change_is_partial_update(pipeline):
+    conn, calls, _, _ = pipeline
+    handler.process_batch([make_item()], [])
+    result = handler.process_batch([make_item(price="12.50")], [])
+    assert result["partial"] == 1
+    assert calls["price"] == ["item-1"]
+
+
+def test_failed_index_is_retried_in_full(pipeline):
+    conn, calls, index_failures, _ = pipeline
+    index_failures.add("item-1")
+    handler.process_batch([make_item()], [])
+    assert conn.rows["item-1"]["content_hash"] is None
+
+    # The row and vector are stored, but the document never made it into
+    # OpenSearch; a price-only update would fail on it forever
+    index_failures.clear()
+    result = handler.process_batch([make_item(price="12.50")], [])
+    assert result["full"] == 1
+    assert result["partial"] == 0
+    assert calls["full"] == ["item-1", "item-1"]
+    assert calls["price"] == []
+    assert conn.rows["item-1"]["content_hash"] is not None
+
+
+def test_forgotten_item_keeps_its_image(pipeline):
+    conn, _, index_failures, _ = pipeline
+    index_failures.add("item-1")
+    handler.process_batch([make_item()], [])
+
+    unchanged, price_only, changed = handler.classify_items(conn, [make_item()])
+    assert (unchanged, price_only) == ([], [])
+    assert changed[0]["s3_image_key"] == "images/item-1.jpg"
+
+
+def test_failed_image_is_fetched_again(pipeline):
+    conn, calls, _, image_failures = pipeline
+    image_failures.add("item-1")
+
+    failures = []
+    result = handler.process_batch([make_item()], failures)
+    assert result["full"] == 1
+    assert conn.rows["item-1"]["s3_image_key"] is None
+    assert [(f["item_id"], f["stage"]) for f in failures] == [("item-1", "image")]
+
+    # Same content on the re-seed: the NULL key still sends it down the
+    # full path, and this time the image is stored
+    image_failures.clear()
+    result = handler.process_batch([make_item()], [])
+    assert result["full"] == 1 and result["skipped"] == 0
+    assert calls["image"] == ["item-1", "item-1"]
+    assert conn.rows["item-1"]["s3_image_key"] == "images/item-1.jpg"
+
+
+def test_failed_image_is_not_a_price_only_update(pipeline):
+    conn, calls, _, image_failures = pipeline
+    image_failures.add("item-1")
+    handler.process_batch([make_item()], [])
+
+    image_failures.clear()
+    result = handler.process_batch([make_item(price="12.50")], [])
+    assert result["full"] == 1 and result["partial"] == 0
+    assert calls["price"] == []
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Concurrency check for order-service cart writes against DynamoDB Local.
+
+Many threads add to the same cart at once, half of them to one shared
+item and half to their own items, with some removes mixed in. Afterwards
+every quantity must equal the number of adds that targeted it. The old
+get_item / put_item path is run the same way for comparison and
+normally loses updates. Optimistic versioning is checked by writing with
+a stale expected_version.
+
+Start DynamoDB Local first, e.g.
+  docker run -p 8000:8000 amazon/dynamodb-local
+
+Usage: python cart_concurrency_check.py [--endpoint http://localhost:8000]
+       [--threads 16] [--adds 50]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+import boto3
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "order-service"))
+
+import carts  # noqa: E402
+
+
+def create_table(dynamodb):
+    name = f"carts-check-{uuid.uuid4().hex[:8]}"
+    table = dynamodb.create_table(
+        TableName=name,
+        KeySchema=[{"AttributeName": "userId", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "userId", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table.wait_until_exists()
+    return table
+
+
+def legacy_add(table, user_id, item_id, quantity, price):
+    """The previous read-modify-write implementation, for comparison"""
+    items = table.get_item(Key={"userId": user_id}).get("Item", {}).get("items", [])
+    for line in items:
+        if line["itemId"] == item_id:
+            line["quantity"] += quantity
+            break
+    else:
+        items.append({"itemId": item_id, "quantity": quantity, "price": Decimal(price)})
+    table.put_item(Item={"userId": user_id, "items": items, "updatedAt": int(time.time())})
+
+
+def hammer(add, threads, adds):
+    """Run concurrent adds; returns the expected quantity per item"""
+
+    def worker(n):
+        for i in range(adds):
+            item_id = "shared" if i % 2 == 0 else f"own-{n}"
+            add(item_id)
+            # Transient lines that are added and removed again
+            if i % 10 == 0:
+                add(f"temp-{n}-{i}", remove=True)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+
+    expected = {"shared": threads * ((adds + 1) // 2)}
+    for n in range(threads):
+        expected[f"own-{n}"] = adds // 2
+    return expected
+
+
+def check(name, expected, lines):
+    actual = {line["itemId"]: int(line["quantity"]) for line in lines}
+    lost = sum(expected.values()) - sum(actual.get(k, 0) for k in expected)
+    extra = sorted(set(actual) - set(expected))
+    ok = lost == 0 and not extra
+    print(f"{name:<8} {'OK' if ok else 'FAIL':<5} lost updates: {lost}, stray lines: {len(extra)}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cart writes for lost updates")
+    parser.add_argument("--endpoint", default="http://localhost:8000")
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--adds", type=int, default=50)
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource(
+        "dynamodb",
+        endpoint_url=args.endpoint,
+        region_name=args.region,
+        aws_access_key_id="local",
+        aws_secret_access_key="local",
+    )
+    table = create_table(dynamodb)
+    try:
+        user = "atomic-user"
+
+        def atomic_add(item_id, remove=False):
+            carts.add_item(table, user, item_id, 1, "9.99")
+            if remove:
+                carts.remove_item(table, user, item_id)
+
+        expected = hammer(atomic_add, args.threads, args.adds)
+        cart = table.get_item(Key={"userId": user})["Item"]
+        ok = check("atomic", expected, carts.cart_lines(cart))
+
+        writes = args.threads * (args.adds + 2 * ((args.adds + 9) // 10))
+        if int(cart["version"]) != writes:
+            print(f"atomic   FAIL version {cart['version']}, expected {writes}")
+            ok = False
+
+        try:
+            carts.add_item(table, user, "shared", 1, "9.99", expected_version=1)
+            print("version  FAIL stale expected_version was accepted")
+            ok = False
+        except carts.CartVersionConflict:
+            current = int(cart["version"])
+            carts.add_item(table, user, "shared", 1, "9.99", expected_version=current)
+            print("version  OK    stale write rejected, current version accepted")
+
+        def legacy(item_id, remove=False):
+            legacy_add(table, "legacy-user", item_id, 1, "9.99")
+
+        expected = hammer(legacy, args.threads, args.adds)
+        for n in range(args.threads):
+            for i in range(0, args.adds, 10):
+                expected[f"temp-{n}-{i}"] = 1
+        cart = table.get_item(Key={"userId": "legacy-user"})["Item"]
+        check("legacy", expected, cart["items"])
+    finally:
+        table.delete()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
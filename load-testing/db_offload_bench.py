@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark blocking vs thread-offloaded database calls on one event loop.
+
+Simulates a single uvicorn worker serving N concurrent requests that each
+run one query. "inline" calls psycopg2 directly from the coroutine (the old
+handler behaviour); "offload" goes through a bounded worker-thread pool the
+way database.run_db does. Reports throughput, peak queries in flight and
+the worst event-loop stall seen by a heartbeat task.
+
+Usage:
+    DATABASE_URL=postgresql://... python db_offload_bench.py [--requests 200]
+    python db_offload_bench.py --simulate   # time.sleep stand-in, no database
+"""
+
+import argparse
+import asyncio
+import functools
+import os
+import threading
+import time
+
+import anyio
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+def make_query(args):
+    if args.simulate:
+
+        def query(stats):
+            stats.enter()
+            try:
+                time.sleep(args.query_ms / 1000)
+            finally:
+                stats.leave()
+
+        return query, None
+
+    import psycopg2
+
+    conns = [psycopg2.connect(os.environ["DATABASE_URL"]) for _ in range(args.pool)]
+    free = list(conns)
+    free_lock = threading.Condition()
+
+    def query(stats):
+        with free_lock:
+            while not free:
+                free_lock.wait()
+            conn = free.pop()
+        stats.enter()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_sleep(%s)", (args.query_ms / 1000,))
+            conn.commit()
+        finally:
+            stats.leave()
+            with free_lock:
+                free.append(conn)
+                free_lock.notify()
+
+    return query, conns
+
+
+async def heartbeat(interval, stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(mode, query, args):
+    stats = Stats()
+    lags = []
+    stop = asyncio.Event()
+    limiter = anyio.CapacityLimiter(args.pool)
+
+    async def handler():
+        if mode == "inline":
+            query(stats)
+        else:
+            await anyio.to_thread.run_sync(
+                functools.partial(query, stats), limiter=limiter
+            )
+
+    beat = asyncio.create_task(heartbeat(0.005, stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+
+    return {
+        "mode": mode,
+        "elapsed_s": elapsed,
+        "req_per_s": args.requests / elapsed,
+        "peak_in_flight": stats.peak,
+        "max_loop_stall_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--pool", type=int, default=10, help="DB_POOL_MAX_SIZE")
+    parser.add_argument("--query-ms", type=float, default=20)
+    parser.add_argument("--simulate", action="store_true")
+    args = parser.parse_args()
+
+    query, conns = make_query(args)
+    try:
+        print(f"{args.requests} requests, pool={args.pool}, query={args.query_ms}ms")
+        print(f"{'mode':<8} {'elapsed':>9} {'req/s':>9} {'in-flight':>10} {'stall':>10}")
+        for mode in ("inline", "offload"):
+            r = asyncio.run(run(mode, query, args))
+            print(
+                f"{r['mode']:<8} {r['elapsed_s']:>8.2f}s {r['req_per_s']:>9.1f} "
+                f"{r['peak_in_flight']:>10} {r['max_loop_stall_ms']:>8.1f}ms"
+            )
+    finally:
+        for conn in conns or []:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
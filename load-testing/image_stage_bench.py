@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Run the ingestion image stage against a local HTTP server and an
+in-memory S3 stand-in, comparing one worker (the old serial path) with a
+concurrent pool.
+
+The server generates JPEGs of the requested size and can add artificial
+latency to mimic remote image hosts. Every stored object is decoded again
+to check that the full image and thumbnails have the expected dimensions.
+
+Usage: python image_stage_bench.py [--images 64] [--latency-ms 150]
+       [--size 1024] [--workers 1 8 16] [--thumbnails 512 256 128]
+"""
+
+import argparse
+import io
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda" / "ingestion"))
+
+from images import ImageStage, image_key, thumbnail_key  # noqa: E402
+
+
+class MemoryS3:
+    """Stand-in for the boto3 S3 client; only put_object is used"""
+
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        with self._lock:
+            self.objects[(Bucket, Key)] = Body
+
+
+def make_handler(size, latency):
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 80, 40)).save(buffer, format="PNG")
+    body = buffer.getvalue()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path.startswith("/missing"):
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def check(s3, bucket, item_ids, size, thumbnails):
+    for item_id in item_ids:
+        full = Image.open(io.BytesIO(s3.objects[(bucket, image_key(item_id))]))
+        assert full.size == (size, size), full.size
+        for thumb in thumbnails:
+            img = Image.open(io.BytesIO(s3.objects[(bucket, thumbnail_key(item_id, thumb))]))
+            assert max(img.size) == min(thumb, size), (thumb, img.size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion image stage")
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--thumbnails", type=int, nargs="*", default=[512, 256, 128])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(args.size, args.latency_ms / 1000)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    item_ids = [f"bench-{i}" for i in range(args.images)]
+    images = [(item_id, f"{base}/{item_id}.png") for item_id in item_ids]
+    images.append(("bench-missing", f"{base}/missing.png"))
+
+    print(f"{'workers':>8} {'seconds':>9} {'images/s':>9}")
+    try:
+        for workers in args.workers:
+            s3 = MemoryS3()
+            stage = ImageStage(
+                s3, "bench", workers=workers, thumbnail_sizes=args.thumbnails
+            )
+            t = time.perf_counter()
+            keys = stage.process(images)
+            elapsed = time.perf_counter() - t
+            stage.close()
+
+            assert keys.pop("bench-missing") is None
+            assert all(keys[item_id] == image_key(item_id) for item_id in item_ids)
+            check(s3, "bench", item_ids, args.size, args.thumbnails)
+            print(f"{workers:>8} {elapsed:>9.2f} {args.images / elapsed:>9.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Recall@k and latency of the search-service IVF index against brute force.
+
+By default uses a synthetic clustered catalog of unit vectors shaped like
+MiniLM output (384 dims). Pass --vectors to benchmark a saved matrix,
+e.g. the vectors.npy of a persisted index directory.
+
+Usage: python vector_index_bench.py [--items 100000] [--queries 500]
+       [--k 10] [--nlist 256] [--nprobe 1 4 8 16 32] [--vectors file.npy]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(
+    0, str(Path(__file__).resolve().parent.parent / "services" / "search-service")
+)
+
+from vector_index import VectorIndex  # noqa: E402
+
+
+def synthetic_catalog(n, dim, clusters, rng):
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)]
+    vectors += 1.2 * rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def brute_force(vectors, norms, query, k):
+    dists = norms - 2 * (vectors @ query)
+    top = np.argpartition(dists, k - 1)[:k]
+    return top[np.argsort(dists[top])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local vector index")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--vectors", help="Optional .npy matrix of real embeddings")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = synthetic_catalog(args.items, args.dim, 200, rng)
+    n = len(vectors)
+    ids = [str(i) for i in range(n)]
+
+    t = time.perf_counter()
+    index = VectorIndex.build(ids, vectors, [{} for _ in ids], nlist=args.nlist)
+    elapsed = time.perf_counter() - t
+    print(f"Built index over {n} vectors ({index.nlist} lists) in {elapsed:.1f}s")
+
+    picks = rng.choice(n, size=args.queries, replace=False)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(args.queries, vectors.shape[1]))
+    queries = queries.astype(np.float32)
+
+    norms = np.einsum("ij,ij->i", vectors, vectors)
+    truth, exact_times = [], []
+    for q in queries:
+        t = time.perf_counter()
+        truth.append(set(brute_force(vectors, norms, q, args.k).tolist()))
+        exact_times.append(time.perf_counter() - t)
+
+    print(f"\n{'method':<14} {f'recall@{args.k}':>10} {'p50':>9} {'p95':>9}")
+    print(
+        f"{'brute force':<14} {1.0:>10.3f} "
+        f"{np.percentile(exact_times, 50) * 1000:>7.2f}ms "
+        f"{np.percentile(exact_times, 95) * 1000:>7.2f}ms"
+    )
+    for nprobe in args.nprobe:
+        hits, times = 0, []
+        for q, expected in zip(queries, truth):
+            t = time.perf_counter()
+            found = index.search(q, args.k, nprobe=nprobe)
+            times.append(time.perf_counter() - t)
+            hits += len(expected & {int(r["item_id"]) for r in found})
+        recall = hits / (args.k * len(queries))
+        print(
+            f"{f'ivf nprobe={nprobe}':<14} {recall:>10.3f} "
+            f"{np.percentile(times, 50) * 1000:>7.2f}ms "
+            f"{np.percentile(times, 95) * 1000:>7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
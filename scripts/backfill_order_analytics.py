@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Backfill order_items from orders placed before it existed and rebuild the
+item_sales / daily_sales rollups from order_items.
+
+Runs in one transaction with the analytics tables locked against writes,
+so orders placed meanwhile wait a moment and then record themselves on
+top of the rebuilt totals. Safe to re-run.
+
+Usage: DATABASE_URL=postgresql://... python backfill_order_analytics.py
+"""
+
+import os
+import sys
+
+import psycopg2
+
+BACKFILL_SQL = """
+    INSERT INTO order_items (order_id, item_id, quantity, unit_price, created_at)
+    SELECT o.order_id, line->>'itemId', sum((line->>'quantity')::int),
+           max((line->>'price')::numeric), o.created_at
+    FROM orders o
+    CROSS JOIN LATERAL jsonb_array_elements(
+        CASE WHEN jsonb_typeof(o.items) = 'string'
+             THEN (o.items #>> '{}')::jsonb
+             ELSE o.items END
+    ) AS line
+    WHERE NOT EXISTS (SELECT 1 FROM order_items oi WHERE oi.order_id = o.order_id)
+    GROUP BY o.order_id, line->>'itemId', o.created_at
+"""
+
+REBUILD_ITEM_SALES_SQL = """
+    INSERT INTO item_sales (item_id, units_sold, revenue, order_count, last_sold_at)
+    SELECT item_id, sum(quantity), sum(quantity * unit_price), count(*), max(created_at)
+    FROM order_items
+    GROUP BY item_id
+"""
+
+# Rebuilt totals go to shard 0; readers sum over shards anyway
+REBUILD_DAILY_SALES_SQL = """
+    INSERT INTO daily_sales (day, shard, orders, units, revenue)
+    SELECT created_at::date, 0, count(DISTINCT order_id), sum(quantity),
+           sum(quantity * unit_price)
+    FROM order_items
+    GROUP BY created_at::date
+"""
+
+
+def main():
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        print("Error: DATABASE_URL environment variable is missing.")
+        sys.exit(1)
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "LOCK TABLE order_items, item_sales, daily_sales IN EXCLUSIVE MODE"
+            )
+            cur.execute(BACKFILL_SQL)
+            print(f"Backfilled {cur.rowcount} order lines")
+
+            cur.execute("DELETE FROM item_sales")
+            cur.execute(REBUILD_ITEM_SALES_SQL)
+            print(f"Rebuilt item_sales: {cur.rowcount} items")
+
+            cur.execute("DELETE FROM daily_sales")
+            cur.execute(REBUILD_DAILY_SALES_SQL)
+            print(f"Rebuilt daily_sales: {cur.rowcount} days")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Check that alternative embedding backends stay compatible with the torch
+vectors already in OpenSearch, and compare their latency and memory.
+
+Each backend is loaded in its own process so peak RSS is measured in
+isolation. Every candidate's vectors are compared row by row with the
+torch reference; the script exits non-zero if any cosine similarity falls
+below the tolerance.
+
+Usage: python compare_embedding_backends.py [csv_file] [--backends onnx onnx-int8]
+       [--tolerance 0.99] [--limit 200]
+"""
+
+import argparse
+import csv
+import multiprocessing as mp
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "services" / "search-service"))
+
+from embeddings import BACKENDS, DEFAULT_MODEL_NAME, load_embedding_model  # noqa: E402
+
+
+def load_texts(csv_path, limit):
+    with open(csv_path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        texts = [row["catalog_content"] for _, row in zip(range(limit), reader)]
+    return texts
+
+
+def run_backend(model_name, backend, texts, queue):
+    """Child process: load one backend, time it and send back its vectors"""
+    start = time.perf_counter()
+    model = load_embedding_model(model_name, backend)
+    load_s = time.perf_counter() - start
+
+    model.encode(texts[:8])  # warm-up
+
+    single = []
+    for text in texts[:50]:
+        t = time.perf_counter()
+        model.encode(text)
+        single.append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    vectors = model.encode(texts, batch_size=32)
+    batch_s = time.perf_counter() - t
+
+    queue.put(
+        {
+            "backend": backend,
+            "load_s": load_s,
+            "single_p50_ms": float(np.percentile(single, 50)) * 1000,
+            "single_p95_ms": float(np.percentile(single, 95)) * 1000,
+            "batch_per_item_ms": batch_s / len(texts) * 1000,
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "vectors": np.asarray(vectors, dtype=np.float32),
+        }
+    )
+
+
+def measure(model_name, backend, texts):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=run_backend, args=(model_name, backend, texts, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def cosine_rows(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends")
+    parser.add_argument(
+        "csv_path", nargs="?", default=str(REPO_ROOT / "data" / "sample_items.csv")
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=[b for b in BACKENDS if b != "torch"],
+        choices=[b for b in BACKENDS if b != "torch"],
+    )
+    parser.add_argument("--tolerance", type=float, default=0.99)
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    texts = load_texts(args.csv_path, args.limit)
+    print(f"Encoding {len(texts)} descriptions with {args.model}")
+
+    reference = measure(args.model, "torch", texts)
+    results = [reference] + [measure(args.model, b, texts) for b in args.backends]
+
+    print(f"\n{'=' * 78}")
+    print(
+        f"{'backend':<11} {'load':>7} {'p50':>9} {'p95':>9} {'batch/item':>11} "
+        f"{'peak RSS':>10} {'min cos':>9}"
+    )
+    failed = False
+    for r in results:
+        cos = cosine_rows(reference["vectors"], r["vectors"])
+        min_cos = float(cos.min())
+        if min_cos < args.tolerance:
+            failed = True
+        print(
+            f"{r['backend']:<11} {r['load_s']:>6.1f}s {r['single_p50_ms']:>7.1f}ms "
+            f"{r['single_p95_ms']:>7.1f}ms {r['batch_per_item_ms']:>9.2f}ms "
+            f"{r['peak_rss_mb']:>8.0f}MB {min_cos:>9.4f}"
+        )
+    print(f"{'=' * 78}")
+
+    if failed:
+        print(f"FAIL: a backend fell below cosine tolerance {args.tolerance}")
+        sys.exit(1)
+    print(f"OK: all backends within cosine tolerance {args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
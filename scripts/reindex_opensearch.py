@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Rebuild the OpenSearch items index from vectors stored in Postgres.
+
+Streams items joined with item_vectors through a server-side cursor and
+writes them with parallel _bulk requests, so recreating the index (e.g.
+after changing its k-NN parameters in init-opensearch-job.yaml) needs no
+embedding model. Refresh is paused while loading and restored afterwards.
+
+Connection settings default to the same environment variables as the
+services: DATABASE_URL, OPENSEARCH_ENDPOINT, OPENSEARCH_USERNAME,
+OPENSEARCH_PASSWORD, MODEL_NAME and EMBEDDING_BACKEND.
+
+Usage: python reindex_opensearch.py [--index items] [--batch-size 500]
+       [--threads 4] [--model NAME] [--backend torch]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import psycopg2
+from opensearchpy import OpenSearch, RequestsHttpConnection, helpers
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Same layout as embeddings.vector_to_bytes; not imported so this script
+# doesn't need sentence-transformers installed
+VECTOR_DTYPE = np.dtype("<f4")
+
+CATALOG_QUERY = """
+    SELECT i.item_id, i.description, i.price, i.image_url, i.s3_image_key,
+           i.created_at, v.embedding
+    FROM items i
+    JOIN item_vectors v ON v.item_id = i.item_id AND v.model_name = %s
+"""
+
+MISSING_QUERY = """
+    SELECT count(*)
+    FROM items i
+    WHERE NOT EXISTS (
+        SELECT 1 FROM item_vectors v
+        WHERE v.item_id = i.item_id AND v.model_name = %s
+    )
+"""
+
+
+def stream_actions(conn, model_key, index, batch_size):
+    with conn.cursor(name="reindex") as cur:
+        cur.itersize = batch_size
+        cur.execute(CATALOG_QUERY, (model_key,))
+        for item_id, description, price, image_url, s3_image_key, created_at, data in cur:
+            yield {
+                "_op_type": "index",
+                "_index": index,
+                "_id": item_id,
+                "_source": {
+                    "item_id": item_id,
+                    "description": description,
+                    "price": float(price),
+                    "image_url": image_url,
+                    "s3_image_key": s3_image_key,
+                    "embedding": np.frombuffer(data, dtype=VECTOR_DTYPE).tolist(),
+                    "created_at": created_at.isoformat() if created_at else None,
+                },
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reindex OpenSearch from Postgres")
+    parser.add_argument("--index", default="items")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--opensearch-host", default=os.environ.get("OPENSEARCH_ENDPOINT"))
+    parser.add_argument("--opensearch-port", type=int, default=443)
+    parser.add_argument("--model", default=os.environ.get("MODEL_NAME", DEFAULT_MODEL_NAME))
+    parser.add_argument("--backend", default=os.environ.get("EMBEDDING_BACKEND", "torch"))
+    args = parser.parse_args()
+
+    if not args.database_url or not args.opensearch_host:
+        print("Error: DATABASE_URL and OPENSEARCH_ENDPOINT are required")
+        sys.exit(1)
+
+    model_key = f"{args.model}@{args.backend}"
+    conn = psycopg2.connect(args.database_url)
+    client = OpenSearch(
+        hosts=[{"host": args.opensearch_host, "port": args.opensearch_port}],
+        http_auth=(
+            os.environ.get("OPENSEARCH_USERNAME"),
+            os.environ.get("OPENSEARCH_PASSWORD"),
+        ),
+        use_ssl=True,
+        verify_certs=True,
+        connection_class=RequestsHttpConnection,
+        timeout=60,
+    )
+
+    with conn.cursor() as cur:
+        cur.execute(MISSING_QUERY, (model_key,))
+        missing = cur.fetchone()[0]
+    if missing:
+        print(f"Warning: {missing} items have no stored {model_key} vector and are skipped")
+
+    # None when unset, which restores the default on the way out
+    settings = client.indices.get_settings(index=args.index)
+    refresh_interval = settings[args.index]["settings"]["index"].get("refresh_interval")
+    client.indices.put_settings(
+        index=args.index, body={"index": {"refresh_interval": "-1"}}
+    )
+
+    indexed = failed = 0
+    started = last_report = time.monotonic()
+    try:
+        for ok, info in helpers.parallel_bulk(
+            client,
+            stream_actions(conn, model_key, args.index, args.batch_size),
+            thread_count=args.threads,
+            chunk_size=args.batch_size,
+            raise_on_error=False,
+            raise_on_exception=False,
+        ):
+            if ok:
+                indexed += 1
+            else:
+                failed += 1
+                print(f"✗ Failed to index: {info}")
+
+            now = time.monotonic()
+            if now - last_report >= 5:
+                rate = indexed / (now - started)
+                print(f"Progress: {indexed} indexed, {failed} failed, {rate:.0f} docs/s")
+                last_report = now
+    finally:
+        client.indices.put_settings(
+            index=args.index, body={"index": {"refresh_interval": refresh_interval}}
+        )
+        client.indices.refresh(index=args.index)
+        conn.close()
+
+    elapsed = time.monotonic() - started
+    print(f"\n{'=' * 50}")
+    print("Summary:")
+    print(f"  Model: {model_key}")
+    print(f"  Indexed: {indexed}")
+    print(f"  Failed: {failed}")
+    print(f"  Missing vectors: {missing}")
+    print(f"  Time: {elapsed:.1f}s ({indexed / elapsed if elapsed else 0:.0f} docs/s)")
+    print(f"{'=' * 50}")
+
+
+if __name__ == "__main__":
+    main()
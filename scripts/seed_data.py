@@ -1,15 +1,31 @@
 #!/usr/bin/env python3
 """
 Seed script to parse CSV and upload items to S3 for Lambda processing
-Usage: python seed_data.py <csv_file_path> <s3_bucket_name>
+Usage: python seed_data.py <csv_file_path> <s3_bucket_name> [limit]
+       [--workers 16] [--batch-size 50] [--checkpoint seed.ckpt]
+
+With --workers or --batch-size the CSV is streamed and uploaded from a
+thread pool. --batch-size N packs N items per compact JSONL manifest
+(manifests/<csv name>-<chunk>.jsonl) that the ingestion Lambda processes
+as one batch. --checkpoint records finished chunks so an interrupted run
+can be resumed with the same arguments.
 """
 
+import argparse
 import csv
 import json
-import boto3
+import os
 import sys
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
+import boto3
+from botocore.config import Config
+
+PROGRESS_INTERVAL = 2.0
+
 
 def parse_csv_row(row):
     """Parse CSV row and create item JSON"""
@@ -73,18 +89,182 @@ def upload_items_to_s3(csv_path, bucket_name, limit=None):
         print(f"{'=' * 50}")
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print(
-            "Usage: python seed_data.py <csv_file_path> <s3_bucket_name> [limit]")
-        print(
-            "Example: python seed_data.py data.csv ecommerce-ms-ingestion-trigger-dev 10"
+def read_chunks(csv_path, batch_size, limit, stats):
+    """Stream the CSV as (chunk number, items) without loading it all"""
+    with open(csv_path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        chunk, seq, rows = [], 0, 0
+        for row in reader:
+            if limit and rows >= limit:
+                break
+            rows += 1
+            try:
+                chunk.append(parse_csv_row(row))
+            except Exception as e:
+                stats["invalid"] += 1
+                print(f"✗ Error parsing row {rows}: {e}")
+                continue
+            if len(chunk) == batch_size:
+                yield seq, chunk
+                chunk, seq = [], seq + 1
+        if chunk:
+            yield seq, chunk
+
+
+class Checkpoint:
+    """Finished chunk numbers, stored as a contiguous watermark plus stragglers"""
+
+    def __init__(self, path, csv_path, batch_size):
+        self.path = path
+        self.csv_path = str(csv_path)
+        self.batch_size = batch_size
+        self.watermark = 0
+        self.done = set()
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state["csv"] != self.csv_path or state["batch_size"] != batch_size:
+                raise ValueError(
+                    f"Checkpoint {path} was written for {state['csv']} with "
+                    f"batch size {state['batch_size']}"
+                )
+            self.watermark = state["watermark"]
+            self.done = set(state["done"])
+
+    def is_done(self, seq):
+        return seq < self.watermark or seq in self.done
+
+    def mark(self, seq):
+        with self._lock:
+            self.done.add(seq)
+            while self.watermark in self.done:
+                self.done.remove(self.watermark)
+                self.watermark += 1
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            state = {
+                "csv": self.csv_path,
+                "batch_size": self.batch_size,
+                "watermark": self.watermark,
+                "done": sorted(self.done),
+            }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+
+def chunk_object(csv_path, seq, items, batch_size):
+    """S3 key and body for one chunk; single items keep the <item_id>.json layout"""
+    if batch_size == 1:
+        item = items[0]
+        return f"{item['item_id']}.json", json.dumps(item, separators=(",", ":"))
+    body = "\n".join(json.dumps(item, separators=(",", ":")) for item in items)
+    return f"manifests/{Path(csv_path).stem}-{seq:08d}.jsonl", body + "\n"
+
+
+def report(stats, started, final=False):
+    elapsed = time.monotonic() - started
+    rate = stats["items"] / elapsed if elapsed else 0.0
+    line = (
+        f"{stats['items']} items in {stats['objects']} objects, "
+        f"{stats['skipped']} chunks resumed, {stats['invalid']} invalid rows, "
+        f"{stats['errors']} failed uploads, "
+        f"{elapsed:.1f}s, {rate:.1f} items/s"
+    )
+    print(("Done: " if final else "Progress: ") + line)
+
+
+def seed_parallel(csv_path, bucket_name, limit, workers, batch_size, checkpoint_path):
+    """Stream the CSV and upload chunks concurrently, resuming from a checkpoint"""
+    s3_client = boto3.client(
+        "s3",
+        config=Config(
+            max_pool_connections=workers,
+            retries={"max_attempts": 5, "mode": "standard"},
+        ),
+    )
+    checkpoint = Checkpoint(checkpoint_path, csv_path, batch_size)
+    stats = {"items": 0, "objects": 0, "skipped": 0, "invalid": 0, "errors": 0}
+    stats_lock = threading.Lock()
+
+    def upload(seq, items):
+        key, body = chunk_object(csv_path, seq, items, batch_size)
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=key,
+            Body=body.encode("utf-8"),
+            ContentType="application/x-ndjson" if batch_size > 1 else "application/json",
         )
-        sys.exit(1)
+        checkpoint.mark(seq)
+        with stats_lock:
+            stats["items"] += len(items)
+            stats["objects"] += 1
 
-    csv_path = sys.argv[1]
-    bucket_name = sys.argv[2]
-    limit = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    started = time.monotonic()
+    last_report = started
+    pending = set()
+
+    def drain(return_when):
+        nonlocal pending
+        finished, pending = wait(pending, return_when=return_when)
+        for future in finished:
+            try:
+                future.result()
+            except Exception as e:
+                with stats_lock:
+                    stats["errors"] += 1
+                print(f"✗ Error uploading chunk: {e}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for seq, items in read_chunks(csv_path, batch_size, limit, stats):
+            if checkpoint.is_done(seq):
+                stats["skipped"] += 1
+                continue
+            # Bound the number of chunks held in memory
+            if len(pending) >= workers * 4:
+                drain(FIRST_COMPLETED)
+            pending.add(pool.submit(upload, seq, items))
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                checkpoint.save()
+                report(stats, started)
+                last_report = now
+        drain(ALL_COMPLETED)
+
+    checkpoint.save()
+    print(f"\n{'=' * 50}")
+    report(stats, started, final=True)
+    print(f"  Bucket: s3://{bucket_name}")
+    if checkpoint_path:
+        print(f"  Checkpoint: {checkpoint_path}")
+    print(f"{'=' * 50}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Upload catalog items to the ingestion bucket",
+        epilog="Example: python seed_data.py data.csv ecommerce-ms-ingestion-trigger-dev 10",
+    )
+    parser.add_argument("csv_path")
+    parser.add_argument("bucket_name")
+    parser.add_argument("limit", type=int, nargs="?")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent uploads")
+    parser.add_argument(
+        "--batch-size", type=int, default=1, help="Items per JSONL manifest object"
+    )
+    parser.add_argument("--checkpoint", help="File recording finished chunks")
+    args = parser.parse_args()
+
+    csv_path = args.csv_path
+    bucket_name = args.bucket_name
+    limit = args.limit
 
     if not Path(csv_path).exists():
         print(f"Error: File not found: {csv_path}")
@@ -94,4 +274,14 @@ if __name__ == "__main__":
     if limit:
         print(f"Processing first {limit} items only")
 
-    upload_items_to_s3(csv_path, bucket_name, limit)
+    if args.workers > 1 or args.batch_size > 1 or args.checkpoint:
+        seed_parallel(
+            csv_path,
+            bucket_name,
+            limit,
+            max(1, args.workers),
+            max(1, args.batch_size),
+            args.checkpoint,
+        )
+    else:
+        upload_items_to_s3(csv_path, bucket_name, limit)
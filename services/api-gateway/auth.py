@@ -0,0 +1,62 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from prometheus_client import Counter, Gauge
+
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+# Upper bound on how long a token without an "exp" claim stays cached
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", "300"))
+
+CACHE_HITS = Counter("gateway_jwt_cache_hits_total", "Verified-token cache hits")
+CACHE_MISSES = Counter("gateway_jwt_cache_misses_total", "Verified-token cache misses")
+CACHE_ENTRIES = Gauge("gateway_jwt_cache_entries", "Tokens held in the verified cache")
+
+
+class TokenCache:
+    """LRU cache of already-verified tokens, keyed by SHA-256 of the token"""
+
+    def __init__(self, max_size: int = JWT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple[float, dict]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            CACHE_MISSES.inc()
+            return None
+
+        expires_at, claims = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            CACHE_ENTRIES.set(len(self._entries))
+            CACHE_MISSES.inc()
+            return None
+
+        self._entries.move_to_end(key)
+        CACHE_HITS.inc()
+        return claims
+
+    def put(self, token: str, claims: dict):
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + JWT_CACHE_MAX_TTL
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+
+        key = self._key(token)
+        self._entries[key] = (expires_at, claims)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        CACHE_ENTRIES.set(len(self._entries))
+
+
+token_cache = TokenCache()
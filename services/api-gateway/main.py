@@ -1,11 +1,13 @@
 from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
-import httpx
 import jwt
 import os
 from typing import Optional
 
+import upstream
+from auth import token_cache
+
 app = FastAPI(title="API Gateway", version="1.0.0")
 
 app.add_middleware(
@@ -30,6 +32,16 @@ SERVICES = {
 JWT_SECRET = os.getenv("JWT_SECRET")
 
 
+@app.on_event("startup")
+async def startup():
+    upstream.start_clients(SERVICES)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await upstream.close_clients()
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "api-gateway"}
@@ -38,71 +50,141 @@ async def health_check():
 # Auth endpoints (no token required)
 @app.post("/auth/register")
 async def register(user_data: dict):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{SERVICES['user']}/register", json=user_data)
-        return response.json()
+    return await upstream.proxy("user", "POST", "/register", json=user_data)
 
 
 @app.post("/auth/login")
 async def login(credentials: dict):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{SERVICES['user']}/login", json=credentials)
-        return response.json()
+    return await upstream.proxy("user", "POST", "/login", json=credentials)
 
 
 # Protected endpoints
 @app.get("/search")
-async def search(q: str, authorization: Optional[str] = Header(None)):
+async def search(
+    q: str,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    mode: Optional[str] = None,
+    authorization: Optional[str] = Header(None),
+):
     verify_token(authorization)
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{SERVICES['search']}/search", params={"q": q})
-        return response.json()
+    params = {
+        "q": q,
+        "limit": limit,
+        "offset": offset,
+        "min_price": min_price,
+        "max_price": max_price,
+        "mode": mode,
+    }
+    params = {key: value for key, value in params.items() if value is not None}
+    return await upstream.proxy("search", "GET", "/search", params=params)
+
+
+@app.get("/items/{item_id}")
+async def get_item(item_id: str, authorization: Optional[str] = Header(None)):
+    verify_token(authorization)
+    return await upstream.proxy("search", "GET", f"/items/{item_id}")
+
+
+@app.post("/items:batchGet")
+async def batch_get_items(request: dict, authorization: Optional[str] = Header(None)):
+    verify_token(authorization)
+    return await upstream.proxy("search", "POST", "/items:batchGet", json=request)
 
 
 @app.get("/cart/{user_id}")
 async def get_cart(user_id: str, authorization: Optional[str] = Header(None)):
-    verify_token(authorization)
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{SERVICES['order']}/cart/{user_id}")
-        return response.json()
+    verify_user(authorization, user_id)
+    return await upstream.proxy("order", "GET", f"/cart/{user_id}")
 
 
 @app.post("/cart/{user_id}/add")
 async def add_to_cart(
     user_id: str, item: dict, authorization: Optional[str] = Header(None)
 ):
-    verify_token(authorization)
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{SERVICES['order']}/cart/{user_id}/add", json=item
-        )
-        return response.json()
+    verify_user(authorization, user_id)
+    return await upstream.proxy(
+        "order", "POST", f"/cart/{user_id}/add", json=item
+    )
+
+
+@app.delete("/cart/{user_id}/remove/{item_id}")
+async def remove_from_cart(
+    user_id: str,
+    item_id: str,
+    expected_version: Optional[int] = None,
+    authorization: Optional[str] = Header(None),
+):
+    verify_user(authorization, user_id)
+    params = {}
+    if expected_version is not None:
+        params["expected_version"] = expected_version
+    return await upstream.proxy(
+        "order", "DELETE", f"/cart/{user_id}/remove/{item_id}", params=params
+    )
 
 
 @app.post("/orders/{user_id}/place")
-async def place_order(user_id: str, authorization: Optional[str] = Header(None)):
-    verify_token(authorization)
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{SERVICES['order']}/orders/{user_id}/place")
-        return response.json()
+async def place_order(
+    user_id: str,
+    authorization: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    verify_user(authorization, user_id)
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+    return await upstream.proxy(
+        "order", "POST", f"/orders/{user_id}/place", headers=headers
+    )
 
 
 @app.get("/orders/{user_id}")
-async def get_orders(user_id: str, authorization: Optional[str] = Header(None)):
-    verify_token(authorization)
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{SERVICES['order']}/orders/{user_id}")
-        return response.json()
+async def get_orders(
+    user_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    view: Optional[str] = None,
+    authorization: Optional[str] = Header(None),
+):
+    verify_user(authorization, user_id)
+    params = {"limit": limit, "cursor": cursor, "view": view}
+    params = {key: value for key, value in params.items() if value is not None}
+    return await upstream.proxy("order", "GET", f"/orders/{user_id}", params=params)
+
+
+@app.get("/orders/{user_id}/{order_id}")
+async def get_order(
+    user_id: str, order_id: str, authorization: Optional[str] = Header(None)
+):
+    verify_user(authorization, user_id)
+    return await upstream.proxy("order", "GET", f"/orders/{user_id}/{order_id}")
 
 
-def verify_token(authorization: Optional[str]):
+def verify_token(authorization: Optional[str]) -> dict:
+    """Verify the bearer token and return its decoded claims (e.g. user_id)"""
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header required")
 
+    token = authorization.replace("Bearer ", "")
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+
     try:
-        token = authorization.replace("Bearer ", "")
-        jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        claims = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+
+    token_cache.put(token, claims)
+    return claims
+
+
+def verify_user(authorization: Optional[str], user_id: str) -> dict:
+    """Verify the token and that it belongs to the user named in the path"""
+    claims = verify_token(authorization)
+    if claims.get("user_id") != user_id:
+        raise HTTPException(status_code=403, detail="Token does not match user")
+    return claims
@@ -0,0 +1,69 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import upstream
+
+
+class UpstreamBody(httpx.AsyncByteStream):
+    def __init__(self, reset: bool):
+        self.reset = reset
+        self.closed = False
+
+    async def __aiter__(self):
+        yield b'{"items": ['
+        if self.reset:
+            raise httpx.ReadError("connection reset by peer")
+        yield b"]}"
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    bodies = []
+
+    def handler(request):
+        body = UpstreamBody(reset=request.url.path == "/reset")
+        bodies.append(body)
+        return httpx.Response(200, stream=body, headers={"retry-after": "1"})
+
+    monkeypatch.setitem(
+        upstream.clients,
+        "order",
+        httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), base_url="http://order"
+        ),
+    )
+    app = FastAPI()
+
+    @app.get("/{path}")
+    async def route(path: str):
+        return await upstream.proxy("order", "GET", f"/{path}")
+
+    return TestClient(app), bodies
+
+
+def in_use():
+    return upstream.POOL_IN_USE.labels(upstream="order")._value.get()
+
+
+def test_completed_stream_releases_connection(gateway):
+    client, bodies = gateway
+    before = in_use()
+    response = client.get("/ok")
+    assert response.content == b'{"items": []}'
+    assert response.headers["retry-after"] == "1"
+    assert bodies[0].closed
+    assert in_use() == before
+
+
+def test_upstream_reset_mid_body_releases_connection(gateway):
+    client, bodies = gateway
+    before = in_use()
+    with pytest.raises(httpx.ReadError):
+        client.get("/reset")
+    assert bodies[0].closed
+    assert in_use() == before
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import main
+import upstream
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+
+    async def proxy(name, method, path, **kwargs):
+        calls.append((method, path))
+        return JSONResponse({"proxied": path})
+
+    monkeypatch.setattr(upstream, "proxy", proxy)
+    client = TestClient(main.app)
+    client.calls = calls
+    return client
+
+
+def bearer(user_id):
+    token = jwt.encode(
+        {"user_id": user_id, "exp": datetime.utcnow() + timedelta(hours=1)},
+        "test-secret",
+        algorithm="HS256",
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize(
+    "method,path",
+    [
+        ("GET", "/cart/{user}"),
+        ("POST", "/cart/{user}/add"),
+        ("DELETE", "/cart/{user}/remove/item-1"),
+        ("POST", "/orders/{user}/place"),
+        ("GET", "/orders/{user}"),
+        ("GET", "/orders/{user}/order-1"),
+    ],
+)
+def test_user_routes_require_the_owners_token(client, method, path):
+    kwargs = {"json": {"item_id": "item-1"}} if path.endswith("/add") else {}
+
+    response = client.request(
+        method, path.format(user="alice"), headers=bearer("alice"), **kwargs
+    )
+    assert response.status_code == 200
+
+    response = client.request(
+        method, path.format(user="bob"), headers=bearer("alice"), **kwargs
+    )
+    assert response.status_code == 403
+    assert len(client.calls) == 1
+
+
+def test_missing_or_invalid_token_is_401(client):
+    assert client.get("/cart/alice").status_code == 401
+    assert (
+        client.get("/cart/alice", headers={"Authorization": "Bearer nope"}).status_code
+        == 401
+    )
+    assert client.calls == []
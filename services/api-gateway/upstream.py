@@ -0,0 +1,123 @@
+import os
+from typing import Dict
+
+import httpx
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter, Gauge
+
+# Pool settings (shared by every upstream)
+MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("UPSTREAM_HTTP2", "false").lower() == "true"
+
+# Timeouts, overridable per upstream with e.g. SEARCH_SERVICE_TIMEOUT
+DEFAULT_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "2"))
+POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "5"))
+
+# Upstream response headers relayed to the client by proxy()
+FORWARDED_HEADERS = {
+    "content-type",
+    "content-length",
+    "content-encoding",
+    "cache-control",
+    "etag",
+    "last-modified",
+    "retry-after",
+}
+
+POOL_IN_USE = Gauge(
+    "gateway_upstream_pool_in_use",
+    "Upstream requests currently holding a pooled connection",
+    ["upstream"],
+)
+POOL_MAX = Gauge(
+    "gateway_upstream_pool_max_connections",
+    "Configured connection limit of the upstream pool",
+    ["upstream"],
+)
+POOL_TIMEOUTS = Counter(
+    "gateway_upstream_pool_timeouts_total",
+    "Requests that gave up waiting for a free upstream connection",
+    ["upstream"],
+)
+
+clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def upstream_timeout(name: str) -> httpx.Timeout:
+    read = float(os.getenv(f"{name.upper()}_SERVICE_TIMEOUT", DEFAULT_TIMEOUT))
+    return httpx.Timeout(read, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT)
+
+
+def start_clients(services: Dict[str, str]):
+    """Create one long-lived pooled client per configured upstream"""
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    for name, base_url in services.items():
+        if not base_url:
+            continue
+        clients[name] = httpx.AsyncClient(
+            base_url=base_url,
+            limits=limits,
+            timeout=upstream_timeout(name),
+            http2=HTTP2_ENABLED,
+        )
+        POOL_MAX.labels(upstream=name).set(MAX_CONNECTIONS)
+
+
+async def close_clients():
+    for client in clients.values():
+        await client.aclose()
+    clients.clear()
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    client = clients.get(name)
+    if client is None:
+        raise HTTPException(status_code=503, detail=f"{name} service unavailable")
+    return client
+
+
+async def proxy(name: str, method: str, path: str, **kwargs) -> StreamingResponse:
+    """Stream an upstream response back unchanged, keeping its status and headers"""
+    client = get_client(name)
+    in_use = POOL_IN_USE.labels(upstream=name)
+    in_use.inc()
+    try:
+        upstream_request = client.build_request(method, path, **kwargs)
+        response = await client.send(upstream_request, stream=True)
+    except httpx.PoolTimeout:
+        in_use.dec()
+        POOL_TIMEOUTS.labels(upstream=name).inc()
+        raise HTTPException(status_code=503, detail=f"{name} service busy")
+    except Exception:
+        in_use.dec()
+        raise
+
+    async def body():
+        # Release in finally rather than a background task: Starlette skips
+        # the background task when streaming raises (e.g. an upstream reset
+        # mid-body), which would leak the connection and the gauge
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+            in_use.dec()
+
+    headers = {
+        key: value
+        for key, value in response.headers.items()
+        if key.lower() in FORWARDED_HEADERS
+    }
+    return StreamingResponse(
+        body(),
+        status_code=response.status_code,
+        headers=headers,
+    )
@@ -0,0 +1,141 @@
+"""Order line items and incrementally maintained sales rollups.
+
+Placing an order writes its lines to `order_items` and folds them into
+`item_sales` (per item) and `daily_sales` (per day) in the same
+transaction, so the analytics endpoints read a handful of small rows
+instead of decoding every order's items JSONB.
+
+Every order touches the current day's row, so `daily_sales` is split
+into DAILY_SHARDS rows per day (picked by order_id) that reads sum up;
+otherwise concurrent placements would queue on one row lock. Item rows
+are updated in item_id order so two orders can't deadlock on them.
+"""
+
+import uuid
+from decimal import Decimal
+from typing import List
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from database import get_db_connection
+
+DAILY_SHARDS = 16
+
+
+def order_lines(items: list) -> List[tuple]:
+    """(item_id, quantity, unit_price) per distinct item, sorted by item_id"""
+    lines = {}
+    for item in items:
+        item_id = str(item["itemId"])
+        quantity = lines.get(item_id, (0, None))[0] + int(item["quantity"])
+        lines[item_id] = (quantity, Decimal(str(item["price"])))
+    return [(item_id, *lines[item_id]) for item_id in sorted(lines)]
+
+
+def record_order(cur, order: dict, items: list):
+    """Write line items and update rollups; call inside the order's transaction"""
+    lines = order_lines(items)
+    if not lines:
+        return
+    order_id = order["order_id"]
+    created_at = order["created_at"]
+
+    execute_values(
+        cur,
+        """
+        INSERT INTO order_items (order_id, item_id, quantity, unit_price, created_at)
+        VALUES %s
+        """,
+        [(order_id, item_id, qty, price, created_at) for item_id, qty, price in lines],
+    )
+    execute_values(
+        cur,
+        """
+        INSERT INTO item_sales (item_id, units_sold, revenue, order_count, last_sold_at)
+        VALUES %s
+        ON CONFLICT (item_id) DO UPDATE
+        SET units_sold = item_sales.units_sold + EXCLUDED.units_sold,
+            revenue = item_sales.revenue + EXCLUDED.revenue,
+            order_count = item_sales.order_count + 1,
+            last_sold_at = GREATEST(item_sales.last_sold_at, EXCLUDED.last_sold_at)
+        """,
+        [(item_id, qty, qty * price, 1, created_at) for item_id, qty, price in lines],
+    )
+    cur.execute(
+        """
+        INSERT INTO daily_sales (day, shard, orders, units, revenue)
+        VALUES (%s::date, %s, 1, %s, %s)
+        ON CONFLICT (day, shard) DO UPDATE
+        SET orders = daily_sales.orders + 1,
+            units = daily_sales.units + EXCLUDED.units,
+            revenue = daily_sales.revenue + EXCLUDED.revenue
+        """,
+        (
+            created_at,
+            uuid.UUID(str(order_id)).int % DAILY_SHARDS,
+            sum(qty for _, qty, _ in lines),
+            sum(qty * price for _, qty, price in lines),
+        ),
+    )
+
+
+def fetch_daily_sales(start, end):
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT day, sum(orders) AS orders, sum(units) AS units,
+                       sum(revenue) AS revenue
+                FROM daily_sales
+                WHERE day BETWEEN %s AND %s
+                GROUP BY day
+                ORDER BY day
+                """,
+                (start, end),
+            )
+            return cur.fetchall()
+
+
+def fetch_top_items(by: str, limit: int):
+    column = {"units": "units_sold", "revenue": "revenue"}[by]
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                f"""
+                SELECT item_id, units_sold, revenue, order_count, last_sold_at
+                FROM item_sales
+                ORDER BY {column} DESC
+                LIMIT %s
+                """,
+                (limit,),
+            )
+            return cur.fetchall()
+
+
+def fetch_item_sales(item_id: str, start, end):
+    """Lifetime totals from the rollup plus a per-day series from order_items"""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT item_id, units_sold, revenue, order_count, last_sold_at
+                FROM item_sales
+                WHERE item_id = %s
+                """,
+                (item_id,),
+            )
+            totals = cur.fetchone()
+            if totals is None:
+                return None
+            cur.execute(
+                """
+                SELECT created_at::date AS day, sum(quantity) AS units,
+                       sum(quantity * unit_price) AS revenue
+                FROM order_items
+                WHERE item_id = %s AND created_at >= %s AND created_at < %s::date + 1
+                GROUP BY day
+                ORDER BY day
+                """,
+                (item_id, start, end),
+            )
+            return {**totals, "daily": cur.fetchall()}
@@ -0,0 +1,227 @@
+"""Cart storage in DynamoDB.
+
+A cart item holds two maps keyed by itemId, `quantities` and `prices`,
+plus a `version` counter. Every mutation is one conditional update_item:
+quantities are changed with ADD so concurrent adds of the same item
+can't lose each other, and `version` is bumped so callers that read a
+cart can make their next write conditional on it (optimistic locking).
+
+Carts written before this layout stored an `items` list; they are still
+readable and are converted on their first mutation.
+"""
+
+import time
+from decimal import Decimal
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+
+class CartNotFound(Exception):
+    pass
+
+
+class CartVersionConflict(Exception):
+    pass
+
+
+def _conditional_failed(e: ClientError) -> bool:
+    return e.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+
+def cart_lines(cart: dict) -> list:
+    """Cart lines as [{"itemId", "quantity", "price"}], for either layout"""
+    if "quantities" not in cart:
+        return list(cart.get("items", []))
+    prices = cart.get("prices", {})
+    return [
+        {"itemId": item_id, "quantity": quantity, "price": prices.get(item_id)}
+        for item_id, quantity in sorted(cart["quantities"].items())
+    ]
+
+
+def to_response(cart: dict) -> dict:
+    return {
+        "userId": cart["userId"],
+        "items": cart_lines(cart),
+        "version": cart.get("version", 0),
+        "updatedAt": cart.get("updatedAt"),
+    }
+
+
+def _version_condition(condition: str, values: dict, expected_version: Optional[int]):
+    if expected_version is None:
+        return condition
+    values[":expected"] = expected_version
+    return f"{condition} AND version = :expected"
+
+
+def _raise_for_version(table, user_id: str, expected_version: Optional[int]):
+    """After a failed conditional write, report a version mismatch if that was it"""
+    if expected_version is None:
+        return
+    current = table.get_item(
+        Key={"userId": user_id}, ProjectionExpression="version"
+    ).get("Item")
+    if current is not None and current.get("version", 0) != expected_version:
+        raise CartVersionConflict(
+            f"Cart is at version {current.get('version', 0)}, expected {expected_version}"
+        )
+
+
+def add_item(
+    table,
+    user_id: str,
+    item_id: str,
+    quantity: int,
+    price,
+    expected_version: Optional[int] = None,
+) -> dict:
+    """Add `quantity` of an item to the cart and return the updated cart"""
+    price = Decimal(str(price))
+    now = int(time.time())
+
+    values = {":q": quantity, ":p": price, ":now": now, ":one": 1}
+    try:
+        return table.update_item(
+            Key={"userId": user_id},
+            UpdateExpression=(
+                "ADD quantities.#item :q, version :one "
+                "SET prices.#item = :p, updatedAt = :now"
+            ),
+            ConditionExpression=_version_condition(
+                "attribute_exists(quantities)", values, expected_version
+            ),
+            ExpressionAttributeNames={"#item": item_id},
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_NEW",
+        )["Attributes"]
+    except ClientError as e:
+        if not _conditional_failed(e):
+            raise
+    _raise_for_version(table, user_id, expected_version)
+
+    # No cart yet (or an old list-based one): create the maps, folding in
+    # any legacy lines. Losing the race to another creator just means the
+    # maps exist now, so go back to the atomic path.
+    legacy = table.get_item(Key={"userId": user_id}).get("Item", {})
+    if "quantities" in legacy:
+        return add_item(table, user_id, item_id, quantity, price, expected_version)
+
+    quantities, prices = {}, {}
+    for line in legacy.get("items", []):
+        quantities[line["itemId"]] = quantities.get(line["itemId"], 0) + line["quantity"]
+        prices[line["itemId"]] = line["price"]
+    quantities[item_id] = quantities.get(item_id, 0) + quantity
+    prices[item_id] = price
+
+    try:
+        return table.update_item(
+            Key={"userId": user_id},
+            UpdateExpression=(
+                "SET quantities = :quantities, prices = :prices, "
+                "updatedAt = :now, version = :version REMOVE #items"
+            ),
+            ConditionExpression="attribute_not_exists(quantities)",
+            ExpressionAttributeNames={"#items": "items"},
+            ExpressionAttributeValues={
+                ":quantities": quantities,
+                ":prices": prices,
+                ":now": now,
+                ":version": legacy.get("version", 0) + 1,
+            },
+            ReturnValues="ALL_NEW",
+        )["Attributes"]
+    except ClientError as e:
+        if not _conditional_failed(e):
+            raise
+    return add_item(table, user_id, item_id, quantity, price, expected_version)
+
+
+def remove_item(
+    table, user_id: str, item_id: str, expected_version: Optional[int] = None
+) -> dict:
+    """Drop an item from the cart and return the updated cart"""
+    values = {":now": int(time.time()), ":one": 1}
+    try:
+        return table.update_item(
+            Key={"userId": user_id},
+            UpdateExpression=(
+                "REMOVE quantities.#item, prices.#item "
+                "SET updatedAt = :now ADD version :one"
+            ),
+            ConditionExpression=_version_condition(
+                "attribute_exists(quantities)", values, expected_version
+            ),
+            ExpressionAttributeNames={"#item": item_id},
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_NEW",
+        )["Attributes"]
+    except ClientError as e:
+        if not _conditional_failed(e):
+            raise
+    _raise_for_version(table, user_id, expected_version)
+
+    legacy = table.get_item(Key={"userId": user_id}).get("Item")
+    if legacy is None:
+        raise CartNotFound(user_id)
+    if "quantities" in legacy:
+        return remove_item(table, user_id, item_id, expected_version)
+
+    # Old list-based cart: convert it without the removed line
+    remaining = [line for line in legacy.get("items", []) if line["itemId"] != item_id]
+    try:
+        return table.update_item(
+            Key={"userId": user_id},
+            UpdateExpression=(
+                "SET quantities = :quantities, prices = :prices, "
+                "updatedAt = :now, version = :version REMOVE #items"
+            ),
+            ConditionExpression="attribute_not_exists(quantities)",
+            ExpressionAttributeNames={"#items": "items"},
+            ExpressionAttributeValues={
+                ":quantities": {line["itemId"]: line["quantity"] for line in remaining},
+                ":prices": {line["itemId"]: line["price"] for line in remaining},
+                ":now": values[":now"],
+                ":version": legacy.get("version", 0) + 1,
+            },
+            ReturnValues="ALL_NEW",
+        )["Attributes"]
+    except ClientError as e:
+        if not _conditional_failed(e):
+            raise
+    return remove_item(table, user_id, item_id, expected_version)
+
+
+def checkout(table, user_id: str) -> Optional[dict]:
+    """Atomically snapshot and clear a non-empty cart; None if it is empty.
+
+    One conditional delete returning the old item, so an add racing with
+    checkout either makes it into the snapshot or lands in a new cart.
+    """
+    try:
+        return table.delete_item(
+            Key={"userId": user_id},
+            ConditionExpression=(
+                "(attribute_exists(quantities) AND size(quantities) > :zero)"
+                " OR (attribute_exists(#items) AND size(#items) > :zero)"
+            ),
+            ExpressionAttributeNames={"#items": "items"},
+            ExpressionAttributeValues={":zero": 0},
+            ReturnValues="ALL_OLD",
+        )["Attributes"]
+    except ClientError as e:
+        if _conditional_failed(e):
+            return None
+        raise
+
+
+def restore(table, user_id: str, lines: list):
+    """Put a checked-out cart's lines back after the order could not be placed.
+
+    Lines without a positive quantity are dropped rather than restored.
+    """
+    for line in lines:
+        if int(line["quantity"]) <= 0:
+            continue
+        add_item(table, user_id, line["itemId"], line["quantity"], line["price"])
@@ -0,0 +1,193 @@
+"""In-process catalog of item prices for validating carts.
+
+Carts store whatever price the client sent with AddToCart, so orders are
+priced from the catalog instead. Checking each line against `items` at
+placement would cost a query per line; this keeps item_id -> (price,
+updated_at) in memory so a whole cart is checked in one pass.
+
+The cache is loaded once at startup and then refreshed incrementally:
+a watcher polls `catalog_version` (bumped by ingestion) and, when the
+generation moves, reads only the items whose updated_at is past the
+watermark. `updated_at` doubles as the entry's version, so an older row
+never overwrites a newer one. Items missing from the cache (ingested
+since the last refresh) are looked up together in a single query, and
+an item that is not in `items` at all is reported as unavailable.
+
+Deleted rows leave nothing behind for the watermark to find, so every
+CATALOG_RECONCILE_SECONDS the cache is also reconciled against the full
+set of item ids (an index-only scan) and entries for items that are gone
+are evicted. This runs on its own timer, not on generation changes:
+ingestion bumps the generation per object while seeding, and a full id
+scan every few seconds would defeat the incremental refresh.
+"""
+
+import asyncio
+import logging
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+from psycopg2.extras import RealDictCursor
+
+from config import settings
+from database import get_db_connection, run_db
+from events_log import log_event
+
+CENT = Decimal("0.01")
+
+CATALOG_ITEMS = Gauge("catalog_cache_items", "Items held in the catalog price cache")
+CATALOG_LOOKUPS = Counter(
+    "catalog_cache_lookups_total", "Cart lines checked against the cache", ["result"]
+)
+
+
+def fetch_items(since=None, item_ids: Optional[List[str]] = None):
+    query = "SELECT item_id, price, updated_at FROM items"
+    params: tuple = ()
+    if item_ids is not None:
+        query += " WHERE item_id = ANY(%s)"
+        params = (item_ids,)
+    elif since is not None:
+        # Same overlap as the search-service local index: rows committed
+        # after the last refresh can carry an older timestamp
+        query += " WHERE updated_at > %s::timestamp - INTERVAL '60 seconds'"
+        params = (since,)
+
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+def fetch_item_ids() -> set:
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT item_id FROM items")
+            return {row[0] for row in cur.fetchall()}
+
+
+def fetch_generation():
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT generation FROM catalog_version WHERE id = 1")
+            row = cur.fetchone()
+    return row[0] if row else 0
+
+
+class CatalogCache:
+    def __init__(self):
+        self.items: Dict[str, Tuple[Decimal, object]] = {}
+        self.watermark = None
+        self.generation = None
+        self.ready = False
+        self.reconciled_at = 0.0
+
+    def _apply(self, rows):
+        for row in rows:
+            current = self.items.get(row["item_id"])
+            version = row["updated_at"]
+            if current and current[1] and version and version < current[1]:
+                continue
+            self.items[row["item_id"]] = (Decimal(row["price"]).quantize(CENT), version)
+            if version is not None and (self.watermark is None or version > self.watermark):
+                self.watermark = version
+        CATALOG_ITEMS.set(len(self.items))
+
+    def load(self):
+        self.generation = fetch_generation()
+        self._apply(fetch_items())
+        self.ready = True
+        self.reconciled_at = time.monotonic()
+        log_event("catalog_loaded", items=len(self.items), generation=self.generation)
+
+    def refresh(self):
+        rows = fetch_items(since=self.watermark)
+        self._apply(rows)
+        return len(rows)
+
+    def reconcile(self) -> int:
+        """Evict items that no longer exist; returns how many were dropped"""
+        existing = fetch_item_ids()
+        gone = [item_id for item_id in list(self.items) if item_id not in existing]
+        for item_id in gone:
+            self.items.pop(item_id, None)
+        self.reconciled_at = time.monotonic()
+        CATALOG_ITEMS.set(len(self.items))
+        return len(gone)
+
+    def prices(self, item_ids: List[str]) -> Dict[str, Decimal]:
+        """Catalog price per known item; misses are fetched in one query"""
+        found = {}
+        missing = []
+        for item_id in item_ids:
+            entry = self.items.get(item_id)
+            if entry is None:
+                missing.append(item_id)
+            else:
+                found[item_id] = entry[0]
+        CATALOG_LOOKUPS.labels(result="hit").inc(len(found))
+        if missing:
+            CATALOG_LOOKUPS.labels(result="miss").inc(len(missing))
+            rows = fetch_items(item_ids=missing)
+            self._apply(rows)
+            for row in rows:
+                found[row["item_id"]] = self.items[row["item_id"]][0]
+        return found
+
+    def check_cart(self, lines: list):
+        """Reprice cart lines from the catalog.
+
+        Returns (lines, unavailable, changed, invalid): the lines with
+        catalog prices, the item_ids that are not in the catalog, the lines
+        whose cart price no longer matches, and the item_ids whose quantity
+        is not positive.
+        """
+        catalog = self.prices([str(line["itemId"]) for line in lines])
+        repriced, unavailable, changed, invalid = [], [], [], []
+        for line in lines:
+            item_id = str(line["itemId"])
+            if int(line["quantity"]) <= 0:
+                invalid.append(item_id)
+                continue
+            price = catalog.get(item_id)
+            if price is None:
+                unavailable.append(item_id)
+                repriced.append(line)
+                continue
+            cart_price = line.get("price")
+            if cart_price is None or Decimal(str(cart_price)).quantize(CENT) != price:
+                changed.append(
+                    {
+                        "item_id": item_id,
+                        "cart_price": None if cart_price is None else float(cart_price),
+                        "price": float(price),
+                    }
+                )
+            repriced.append({**line, "price": price})
+        return repriced, unavailable, changed, invalid
+
+
+async def watch(cache: CatalogCache):
+    """Keep the cache current; loads it first if startup could not"""
+    while True:
+        try:
+            if not cache.ready:
+                await run_db(cache.load)
+            else:
+                generation = await run_db(fetch_generation)
+                if generation != cache.generation:
+                    changed = await run_db(cache.refresh)
+                    cache.generation = generation
+                    log_event(
+                        "catalog_refreshed", generation=generation, items=changed
+                    )
+                if (
+                    time.monotonic() - cache.reconciled_at
+                    >= settings.catalog_reconcile_seconds
+                ):
+                    dropped = await run_db(cache.reconcile)
+                    log_event("catalog_reconciled", dropped=dropped, items=len(cache.items))
+        except Exception as e:
+            log_event("catalog_refresh_failed", logging.ERROR, error=str(e))
+        await asyncio.sleep(settings.catalog_version_poll_seconds)
@@ -0,0 +1,37 @@
+"""Structured, sampled request logging.
+
+Each event is one JSON line. Routine events are kept at LOG_SAMPLE_RATE
+so hot paths don't pay for formatting and shipping a line per request;
+warnings and errors are always written.
+"""
+
+import json
+import logging
+import random
+import sys
+import time
+
+from config import settings
+
+logger = logging.getLogger(settings.service_name)
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_event(event: str, level: int = logging.INFO, **fields):
+    if level < logging.WARNING and random.random() >= settings.log_sample_rate:
+        return
+    record = {
+        "ts": round(time.time(), 3),
+        "level": logging.getLevelName(level).lower(),
+        "service": settings.service_name,
+        "event": event,
+        **fields,
+    }
+    if level < logging.WARNING:
+        record["sample_rate"] = settings.log_sample_rate
+    logger.log(level, json.dumps(record, default=str))
@@ -0,0 +1,78 @@
+"""Idempotency keys for order placement.
+
+A client sends the same `Idempotency-Key` header on every retry of one
+checkout. The key is reserved in `order_requests` before any work is
+done and linked to the order in the order's own transaction, so a retry
+either gets the original order back or, while the first attempt is
+still running, a 409. Reservations whose attempt died without placing
+an order are taken over after `idempotency_pending_timeout` seconds.
+"""
+
+from psycopg2.extras import RealDictCursor
+
+from config import settings
+from database import get_db_connection
+
+
+class RequestInProgress(Exception):
+    pass
+
+
+def reserve(user_id: str, key: str):
+    """Claim the key; returns the original order if it was already used"""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                INSERT INTO order_requests (user_id, idempotency_key)
+                VALUES (%s, %s)
+                ON CONFLICT (user_id, idempotency_key) DO UPDATE
+                SET created_at = CURRENT_TIMESTAMP
+                WHERE order_requests.order_id IS NULL
+                  AND order_requests.created_at
+                      < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+                RETURNING idempotency_key
+                """,
+                (user_id, key, settings.idempotency_pending_timeout),
+            )
+            if cur.fetchone() is not None:
+                return None
+
+            cur.execute(
+                """
+                SELECT o.order_id, o.user_id, o.items, o.total_amount, o.status,
+                       o.created_at
+                FROM order_requests r
+                JOIN orders o ON o.order_id = r.order_id
+                WHERE r.user_id = %s AND r.idempotency_key = %s
+                """,
+                (user_id, key),
+            )
+            order = cur.fetchone()
+            if order is None:
+                raise RequestInProgress(key)
+            return order
+
+
+def complete(cur, user_id: str, key: str, order_id):
+    """Link the key to its order; call inside the order's transaction"""
+    cur.execute(
+        """
+        UPDATE order_requests SET order_id = %s
+        WHERE user_id = %s AND idempotency_key = %s
+        """,
+        (order_id, user_id, key),
+    )
+
+
+def release(user_id: str, key: str):
+    """Drop a reservation whose attempt failed so the client can retry"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM order_requests
+                WHERE user_id = %s AND idempotency_key = %s AND order_id IS NULL
+                """,
+                (user_id, key),
+            )
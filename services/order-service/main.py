@@ -1,18 +1,40 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
+from typing import Literal, Optional
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from prometheus_fastapi_instrumentator import Instrumentator
 import boto3
 from decimal import Decimal
 import time
+from datetime import date, datetime, timedelta
 from psycopg2.extras import RealDictCursor
+import asyncio
+import base64
 import json
-
+import logging
+import uuid
+
+import analytics
+import carts
+import catalog
+import idempotency
+import outbox
 from config import settings
-from database import get_db_connection
+from database import (
+    PoolTimeout,
+    close_pool,
+    get_db_connection,
+    init_pool,
+    pool_timeout_handler,
+    run_db,
+)
+from events_log import log_event
 from models import AddToCart, CartItem, OrderResponse
 
 app = FastAPI(title="Order Service", version="1.0.0")
 
+app.add_exception_handler(PoolTimeout, pool_timeout_handler)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -32,11 +54,48 @@ if settings.dynamodb_endpoint:
 dynamodb = boto3.resource("dynamodb", **dynamodb_config)
 carts_table = dynamodb.Table(settings.carts_table)
 
+outbox_relay = None
+catalog_cache = catalog.CatalogCache()
+catalog_watcher = None
+
 
 @app.on_event("startup")
 async def startup():
+    global outbox_relay
+    global catalog_watcher
     # init_db()
-    pass
+    try:
+        init_pool()
+    except Exception as e:
+        print(f"Database pool warm-up failed: {e}")
+
+    # Warm the price cache before taking traffic; the watcher retries the
+    # load if the database isn't reachable yet
+    try:
+        await run_db(catalog_cache.load)
+    except Exception as e:
+        log_event("catalog_load_failed", logging.WARNING, error=str(e))
+    catalog_watcher = asyncio.create_task(catalog.watch(catalog_cache))
+
+    if settings.outbox_sink != "disabled":
+        try:
+            sink = outbox.create_sink(settings.outbox_sink)
+        except Exception as e:
+            print(f"Outbox relay disabled, {settings.outbox_sink} sink unavailable: {e}")
+        else:
+            outbox_relay = outbox.OutboxRelay(
+                sink, settings.outbox_batch_size, settings.outbox_poll_interval
+            )
+            outbox_relay.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if catalog_watcher is not None:
+        catalog_watcher.cancel()
+    if outbox_relay is not None:
+        await outbox_relay.stop()
+    close_pool()
 
 
 @app.get("/health")
@@ -46,86 +105,63 @@ async def health_check():
 
 @app.get("/cart/{user_id}")
 async def get_cart(user_id: str):
-    response = carts_table.get_item(Key={"userId": user_id})
+    response = await run_in_threadpool(carts_table.get_item, Key={"userId": user_id})
 
     if "Item" not in response:
         return {"user_id": user_id, "items": [], "updated_at": int(time.time())}
 
-    return response["Item"]
+    return carts.to_response(response["Item"])
 
 
 @app.post("/cart/{user_id}/add")
 async def add_to_cart(user_id: str, item: AddToCart):
-    # Get existing cart
-    response = carts_table.get_item(Key={"userId": user_id})
-
-    if "Item" in response:
-        cart = response["Item"]
-        items = cart.get("items", [])
-    else:
-        items = []
-
-    # Check if item exists
-    found = False
-    for cart_item in items:
-        if cart_item["itemId"] == item.item_id:
-            cart_item["quantity"] += item.quantity
-            found = True
-            break
-
-    if not found:
-        items.append(
-            {
-                "itemId": item.item_id,
-                "quantity": item.quantity,
-                "price": Decimal(str(item.price)),
-            }
+    prices = await run_in_threadpool(catalog_cache.prices, [item.item_id])
+    if item.item_id not in prices:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    try:
+        cart = await run_in_threadpool(
+            carts.add_item,
+            carts_table,
+            user_id,
+            item.item_id,
+            item.quantity,
+            prices[item.item_id],
+            item.expected_version,
         )
+    except carts.CartVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-    # Update cart
-    carts_table.put_item(
-        Item={"userId": user_id, "items": items, "updatedAt": int(time.time())}
-    )
-
-    return {"message": "Item added to cart", "items": items}
+    return {"message": "Item added to cart", **carts.to_response(cart)}
 
 
 @app.delete("/cart/{user_id}/remove/{item_id}")
-async def remove_from_cart(user_id: str, item_id: str):
-    response = carts_table.get_item(Key={"userId": user_id})
-
-    if "Item" not in response:
+async def remove_from_cart(
+    user_id: str, item_id: str, expected_version: Optional[int] = None
+):
+    try:
+        cart = await run_in_threadpool(
+            carts.remove_item, carts_table, user_id, item_id, expected_version
+        )
+    except carts.CartNotFound:
         raise HTTPException(status_code=404, detail="Cart not found")
+    except carts.CartVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-    cart = response["Item"]
-    items = [item for item in cart["items"] if item["itemId"] != item_id]
+    return {"message": "Item removed from cart", **carts.to_response(cart)}
 
-    carts_table.put_item(
-        Item={"userId": user_id, "items": items, "updatedAt": int(time.time())}
-    )
 
-    return {"message": "Item removed from cart"}
-
-
-@app.post("/orders/{user_id}/place", response_model=OrderResponse)
-async def place_order(user_id: str):
-    # Get cart
-    response = carts_table.get_item(Key={"userId": user_id})
-
-    if "Item" not in response or not response["Item"].get("items"):
-        raise HTTPException(status_code=400, detail="Cart is empty")
-
-    cart = response["Item"]
-    items = cart["items"]
+def order_total(items: list) -> Decimal:
+    total = sum(
+        (Decimal(str(item["price"])) * int(item["quantity"]) for item in items),
+        Decimal("0"),
+    )
+    return total.quantize(Decimal("0.01"))
 
-    print(f"cart : {cart}")
-    print(f"items : {items}")
-    # Calculate total
-    total = sum(float(item["price"]) * float(item["quantity"])
-                for item in items)
 
-    print(f"Total : {total}")
-    # Create order in RDS
+def insert_order(
+    user_id: str, items: list, total: Decimal, idempotency_key: Optional[str] = None
+):
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
@@ -136,38 +172,231 @@ async def place_order(user_id: str):
                 """,
                 (user_id, json.dumps(items, default=str), total, "placed"),
             )
-            order_data = cur.fetchone()
+            order = cur.fetchone()
+            if idempotency_key:
+                idempotency.complete(cur, user_id, idempotency_key, order["order_id"])
+            analytics.record_order(cur, order, items)
+            # Same transaction: the event is committed iff the order is
+            outbox.add_event(cur, "order_placed", user_id, dict(order))
+            return order
+
+
+ORDER_SUMMARY_COLUMNS = "order_id, user_id, total_amount, status, created_at"
+
+
+def encode_cursor(order) -> str:
+    raw = json.dumps([order["created_at"].isoformat(), str(order["order_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), str(uuid.UUID(order_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    print(order_data)
-    # Clear cart
-    carts_table.delete_item(Key={"userId": user_id})
 
-    print("Cart cleared !")
-    # TODO: Publish to Kafka (Phase 5)
+def fetch_orders(user_id: str, limit: int, after=None, with_items: bool = False):
+    """One page of a user's orders, newest first, keyset-paginated.
 
+    `after` is the (created_at, order_id) of the last order on the previous
+    page. The created_at bound is an index condition on idx_user_orders;
+    order_id only breaks ties between orders placed in the same instant.
+    """
+    columns = ORDER_SUMMARY_COLUMNS + (", items" if with_items else "")
+    query = f"SELECT {columns} FROM orders WHERE user_id = %s"
+    params = [user_id]
+    if after is not None:
+        created_at, order_id = after
+        query += " AND created_at <= %s AND (created_at < %s OR order_id < %s::uuid)"
+        params += [created_at, created_at, order_id]
+    query += " ORDER BY created_at DESC, order_id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+    return rows[:limit], len(rows) > limit
+
+
+def fetch_order(user_id: str, order_id: str):
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                f"""
+                SELECT {ORDER_SUMMARY_COLUMNS}, items
+                FROM orders
+                WHERE order_id = %s::uuid AND user_id = %s
+                """,
+                (order_id, user_id),
+            )
+            return cur.fetchone()
+
+
+def order_response(order) -> OrderResponse:
     return OrderResponse(
-        order_id=str(order_data["order_id"]),
-        user_id=order_data["user_id"],
+        order_id=str(order["order_id"]),
+        user_id=order["user_id"],
         items=[
             CartItem(
                 item_id=item["itemId"], quantity=item["quantity"], price=item["price"]
             )
-            for item in order_data["items"]
+            for item in order["items"]
         ],
-        total_amount=float(order_data["total_amount"]),
-        status=order_data["status"],
-        created_at=order_data["created_at"],
+        total_amount=float(order["total_amount"]),
+        status=order["status"],
+        created_at=order["created_at"],
     )
 
 
-@app.get("/orders/{user_id}")
-async def get_orders(user_id: str):
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT * FROM orders WHERE user_id = %s ORDER BY created_at DESC",
-                (user_id,),
+@app.post("/orders/{user_id}/place", response_model=OrderResponse)
+async def place_order(
+    user_id: str,
+    idempotency_key: Optional[str] = Header(None, max_length=100),
+):
+    """Turn the cart into an order.
+
+    Retries that send the same Idempotency-Key get the original order back
+    without touching the cart again.
+    """
+    started = time.perf_counter()
+    if idempotency_key:
+        try:
+            existing = await run_db(idempotency.reserve, user_id, idempotency_key)
+        except idempotency.RequestInProgress:
+            raise HTTPException(
+                status_code=409, detail="This order is already being placed"
+            )
+        if existing is not None:
+            log_event("order_replayed", user_id=user_id, order_id=existing["order_id"])
+            return order_response(existing)
+
+    try:
+        # Snapshot and clear the cart in one conditional DynamoDB operation
+        cart = await run_in_threadpool(carts.checkout, carts_table, user_id)
+        if cart is None:
+            raise HTTPException(status_code=400, detail="Cart is empty")
+    except Exception:
+        if idempotency_key:
+            await run_db(idempotency.release, user_id, idempotency_key)
+        raise
+
+    lines = carts.cart_lines(cart)
+    restored = lines
+    try:
+        # Price the whole cart from the catalog; the client-sent cart prices
+        # are only compared, never charged
+        items, unavailable, changed, invalid = await run_in_threadpool(
+            catalog_cache.check_cart, lines
+        )
+        restored = items
+        if unavailable or changed or invalid:
+            log_event(
+                "order_rejected",
+                logging.WARNING,
+                user_id=user_id,
+                unavailable=unavailable,
+                price_changed=[line["item_id"] for line in changed],
+                invalid_quantity=invalid,
             )
-            orders = cur.fetchall()
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "message": "Some items in your cart are unavailable or changed price",
+                    "unavailable": unavailable,
+                    "price_changed": changed,
+                    "invalid_quantity": invalid,
+                },
+            )
+        total = order_total(items)
+        order_data = await run_db(insert_order, user_id, items, total, idempotency_key)
+    except Exception as e:
+        if not isinstance(e, HTTPException):
+            log_event(
+                "order_failed", logging.ERROR, user_id=user_id, error=str(e), lines=len(lines)
+            )
+        # Put the cart back, at catalog prices where they are known, so
+        # the client can show the new total and retry
+        await run_in_threadpool(carts.restore, carts_table, user_id, restored)
+        if idempotency_key:
+            await run_db(idempotency.release, user_id, idempotency_key)
+        raise
+
+    log_event(
+        "order_placed",
+        user_id=user_id,
+        order_id=order_data["order_id"],
+        lines=len(items),
+        total=total,
+        duration_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+    return order_response(order_data)
 
-    return orders
+
+@app.get("/orders/{user_id}")
+async def get_orders(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    view: Literal["summary", "full"] = "summary",
+):
+    """Order history page; pass next_cursor back as `cursor` for the next one.
+
+    The summary view leaves out line items; use view=full or the detail
+    endpoint when they are needed.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    orders, has_more = await run_db(
+        fetch_orders, user_id, limit, after, view == "full"
+    )
+    return {
+        "orders": orders,
+        "next_cursor": encode_cursor(orders[-1]) if has_more else None,
+    }
+
+
+@app.get("/orders/{user_id}/{order_id}")
+async def get_order(user_id: str, order_id: str):
+    try:
+        uuid.UUID(order_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    order = await run_db(fetch_order, user_id, order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
+
+
+@app.get("/analytics/sales/daily")
+async def daily_sales(start: Optional[date] = None, end: Optional[date] = None):
+    """Orders, units and revenue per day (default: the last 30 days)"""
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return {"days": await run_db(analytics.fetch_daily_sales, start, end)}
+
+
+@app.get("/analytics/items/top")
+async def top_items(
+    by: Literal["units", "revenue"] = "units",
+    limit: int = Query(10, ge=1, le=100),
+):
+    return {"items": await run_db(analytics.fetch_top_items, by, limit)}
+
+
+@app.get("/analytics/items/{item_id}")
+async def item_sales(
+    item_id: str, start: Optional[date] = None, end: Optional[date] = None
+):
+    """Lifetime sales of one item plus a per-day series (default: last 30 days)"""
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    sales = await run_db(analytics.fetch_item_sales, item_id, start, end)
+    if sales is None:
+        raise HTTPException(status_code=404, detail="No sales for this item")
+    return sales
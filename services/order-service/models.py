@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -11,8 +11,12 @@ class CartItem(BaseModel):
 
 class AddToCart(BaseModel):
     item_id: str
-    quantity: int = 1
-    price: float
+    # Quantities are ADDed to the cart line, so a negative one would shrink it
+    quantity: int = Field(1, ge=1)
+    # Ignored: the cart stores the catalog price
+    price: Optional[float] = None
+    # Reject the write with 409 unless the cart is still at this version
+    expected_version: Optional[int] = None
 
 
 class Cart(BaseModel):
@@ -0,0 +1,240 @@
+"""Transactional outbox for order events.
+
+Order placement inserts an event row into `order_outbox` in the same
+transaction as the order, so an event exists if and only if the order
+does. A background relay moves events to a sink in batches: it takes a
+transaction-scoped advisory lock (one relay publishes at a time, however
+many replicas run), reads the oldest events in event_id order, publishes
+them, and deletes them in the same transaction. A crash between publish
+and commit republishes the batch, so delivery is at-least-once and
+consumers should dedupe on event_id.
+
+Sinks: "kafka" (confluent-kafka, keyed by user_id so a user's events stay
+in one partition), "file" (JSONL, for local runs) and "memory" (tests).
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from psycopg2.extras import Json, RealDictCursor
+
+from config import settings
+from database import get_db_connection, run_db
+from events_log import log_event
+
+# Any constant works; it only has to differ from other advisory locks
+RELAY_LOCK_KEY = 0x6F7574626F78
+
+OUTBOX_PUBLISHED = Counter(
+    "outbox_events_published_total", "Order events delivered to the sink"
+)
+OUTBOX_FAILURES = Counter(
+    "outbox_publish_failures_total", "Relay batches that failed to publish"
+)
+OUTBOX_BATCH_SECONDS = Histogram(
+    "outbox_publish_batch_seconds", "Time to publish and commit one relay batch"
+)
+OUTBOX_PENDING = Gauge("outbox_pending_events", "Events waiting in the outbox")
+OUTBOX_LAG = Gauge(
+    "outbox_lag_seconds", "Age of the oldest unpublished event (0 when empty)"
+)
+
+
+def add_event(cur, event_type: str, user_id: str, payload: dict):
+    """Queue an event; call with the cursor of the transaction it belongs to"""
+    cur.execute(
+        """
+        INSERT INTO order_outbox (event_type, user_id, payload)
+        VALUES (%s, %s, %s)
+        """,
+        (event_type, user_id, Json(payload, dumps=lambda v: json.dumps(v, default=str))),
+    )
+
+
+class MemorySink:
+    def __init__(self):
+        self.events: List[dict] = []
+
+    def publish(self, events: List[dict]):
+        self.events.extend(events)
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    """Appends events as JSON lines; a local stand-in for Kafka"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def publish(self, events: List[dict]):
+        with open(self.path, "a") as f:
+            for event in events:
+                f.write(json.dumps(event, default=str) + "\n")
+            f.flush()
+
+    def close(self):
+        pass
+
+
+class KafkaSink:
+    def __init__(self, bootstrap_servers: str, topic: str):
+        from confluent_kafka import Producer
+
+        self.topic = topic
+        self._producer = Producer(
+            {
+                "bootstrap.servers": bootstrap_servers,
+                "enable.idempotence": True,
+                "acks": "all",
+                "linger.ms": 5,
+            }
+        )
+
+    def publish(self, events: List[dict]):
+        errors = []
+
+        def on_delivery(err, msg):
+            if err is not None:
+                errors.append(err)
+
+        for event in events:
+            self._producer.produce(
+                self.topic,
+                key=event["user_id"],
+                value=json.dumps(event, default=str),
+                on_delivery=on_delivery,
+            )
+        remaining = self._producer.flush(settings.outbox_publish_timeout)
+        if remaining or errors:
+            raise RuntimeError(
+                f"Kafka delivery failed ({remaining} undelivered): {errors[:1]}"
+            )
+
+    def close(self):
+        self._producer.flush(settings.outbox_publish_timeout)
+
+
+def create_sink(kind: str):
+    if kind == "kafka":
+        return KafkaSink(settings.kafka_bootstrap_servers, settings.kafka_order_topic)
+    if kind == "file":
+        return FileSink(settings.outbox_file_path)
+    if kind == "memory":
+        return MemorySink()
+    raise ValueError(f"Unknown outbox sink {kind!r}")
+
+
+def relay_batch(sink, batch_size: int) -> int:
+    """Publish and remove up to batch_size events; returns how many were sent"""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", (RELAY_LOCK_KEY,))
+            if not cur.fetchone()["locked"]:
+                return 0
+
+            cur.execute(
+                """
+                SELECT event_id, event_type, user_id, payload, created_at
+                FROM order_outbox
+                ORDER BY event_id
+                LIMIT %s
+                """,
+                (batch_size,),
+            )
+            events = cur.fetchall()
+            if not events:
+                return 0
+
+            sink.publish([dict(event) for event in events])
+            # Exactly the published ids: a lower id committed after the
+            # SELECT must stay for the next batch
+            cur.execute(
+                "DELETE FROM order_outbox WHERE event_id = ANY(%s)",
+                ([event["event_id"] for event in events],),
+            )
+            return len(events)
+
+
+def outbox_stats():
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT count(*),
+                       EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - min(created_at))
+                FROM order_outbox
+                """
+            )
+            return cur.fetchone()
+
+
+class OutboxRelay:
+    def __init__(self, sink, batch_size: int, poll_interval: float):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+        self._stats_at: Optional[float] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.sink.close()
+
+    def _stats_due(self, sent: int) -> bool:
+        # count(*) scans the table, so only after a batch moved something
+        # or every OUTBOX_STATS_INTERVAL, not on every idle poll
+        return (
+            sent > 0
+            or self._stats_at is None
+            or time.monotonic() - self._stats_at >= settings.outbox_stats_interval
+        )
+
+    async def _run(self):
+        while True:
+            sent = 0
+            try:
+                started = time.perf_counter()
+                sent = await run_db(relay_batch, self.sink, self.batch_size)
+                if sent:
+                    elapsed = time.perf_counter() - started
+                    OUTBOX_BATCH_SECONDS.observe(elapsed)
+                    OUTBOX_PUBLISHED.inc(sent)
+                    log_event(
+                        "outbox_batch_published",
+                        events=sent,
+                        duration_ms=round(elapsed * 1000, 1),
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                OUTBOX_FAILURES.inc()
+                log_event("outbox_relay_failed", logging.ERROR, error=str(e))
+
+            if self._stats_due(sent):
+                try:
+                    pending, lag = await run_db(outbox_stats)
+                    OUTBOX_PENDING.set(pending)
+                    OUTBOX_LAG.set(float(lag or 0))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log_event("outbox_stats_failed", logging.WARNING, error=str(e))
+                self._stats_at = time.monotonic()
+
+            # Drain a backlog back to back; otherwise wait for new events
+            if sent < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
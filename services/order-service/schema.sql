@@ -8,3 +8,52 @@ CREATE TABLE IF NOT EXISTS orders (
 );
 
 CREATE INDEX IF NOT EXISTS idx_user_orders ON orders(user_id, created_at DESC);
+
+-- Order events written with the order and relayed to Kafka in event_id order
+CREATE TABLE IF NOT EXISTS order_outbox (
+    event_id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    user_id VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Order lines and sales rollups maintained on placement (see analytics.py)
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id UUID NOT NULL REFERENCES orders(order_id),
+    item_id VARCHAR(100) NOT NULL,
+    quantity INT NOT NULL,
+    unit_price DECIMAL(10,2) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (order_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS idx_order_items_item ON order_items(item_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_order_items_created_at ON order_items(created_at);
+
+CREATE TABLE IF NOT EXISTS item_sales (
+    item_id VARCHAR(100) PRIMARY KEY,
+    units_sold BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_count BIGINT NOT NULL DEFAULT 0,
+    last_sold_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_item_sales_units ON item_sales(units_sold DESC);
+CREATE INDEX IF NOT EXISTS idx_item_sales_revenue ON item_sales(revenue DESC);
+
+CREATE TABLE IF NOT EXISTS daily_sales (
+    day DATE NOT NULL,
+    shard SMALLINT NOT NULL,
+    orders BIGINT NOT NULL DEFAULT 0,
+    units BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, shard)
+);
+
+-- Idempotency keys of order placements; order_id is set in the order's transaction
+CREATE TABLE IF NOT EXISTS order_requests (
+    user_id VARCHAR(100) NOT NULL,
+    idempotency_key VARCHAR(100) NOT NULL,
+    order_id UUID REFERENCES orders(order_id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, idempotency_key)
+);
@@ -0,0 +1,10 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.Settings requires these at import time
+os.environ.setdefault("DATABASE_URL", "postgresql://test@localhost/test")
+os.environ.setdefault("CARTS_TABLE", "carts")
+os.environ.setdefault("SESSIONS_TABLE", "sessions")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
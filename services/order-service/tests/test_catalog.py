@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from pydantic import ValidationError
+
+import catalog
+from models import AddToCart
+
+T0 = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def items(monkeypatch):
+    """The `items` table, as fetch_items would read it"""
+    table = {}
+
+    def fetch_items(since=None, item_ids=None):
+        rows = [
+            {"item_id": item_id, "price": price, "updated_at": updated_at}
+            for item_id, (price, updated_at) in table.items()
+        ]
+        if item_ids is not None:
+            return [row for row in rows if row["item_id"] in item_ids]
+        if since is not None:
+            return [row for row in rows if row["updated_at"] > since - timedelta(60)]
+        return rows
+
+    monkeypatch.setattr(catalog, "fetch_items", fetch_items)
+    monkeypatch.setattr(catalog, "fetch_item_ids", lambda: set(table))
+    monkeypatch.setattr(catalog, "fetch_generation", lambda: 1)
+    return table
+
+
+def line(item_id, quantity=1, price="1.00"):
+    return {"itemId": item_id, "quantity": Decimal(quantity), "price": Decimal(price)}
+
+
+def test_cart_is_repriced_from_catalog(items):
+    items["a"] = (Decimal("2.50"), T0)
+    cache = catalog.CatalogCache()
+    cache.load()
+
+    lines, unavailable, changed, invalid = cache.check_cart(
+        [line("a", 2, "2.50"), line("b")]
+    )
+    assert unavailable == ["b"]
+    assert changed == [] and invalid == []
+    assert lines[0]["price"] == Decimal("2.50")
+
+
+def test_price_change_is_reported(items):
+    items["a"] = (Decimal("2.50"), T0)
+    cache = catalog.CatalogCache()
+    cache.load()
+    items["a"] = (Decimal("3.00"), T0 + timedelta(seconds=5))
+    cache.refresh()
+
+    _, _, changed, _ = cache.check_cart([line("a", 1, "2.50")])
+    assert changed == [{"item_id": "a", "cart_price": 2.5, "price": 3.0}]
+
+
+def test_non_positive_quantities_are_rejected(items):
+    items["a"] = (Decimal("2.50"), T0)
+    items["b"] = (Decimal("1.00"), T0)
+    cache = catalog.CatalogCache()
+    cache.load()
+
+    lines, _, _, invalid = cache.check_cart(
+        [line("a", -5, "2.50"), line("b", 0), line("b", 1)]
+    )
+    assert invalid == ["a", "b"]
+    assert [(l["itemId"], l["quantity"]) for l in lines] == [("b", 1)]
+
+
+def test_add_to_cart_requires_positive_quantity():
+    with pytest.raises(ValidationError):
+        AddToCart(item_id="a", quantity=-5)
+    with pytest.raises(ValidationError):
+        AddToCart(item_id="a", quantity=0)
+    assert AddToCart(item_id="a").quantity == 1
+
+
+def test_deleted_items_are_evicted(items):
+    items["a"] = (Decimal("2.50"), T0)
+    items["b"] = (Decimal("1.00"), T0)
+    cache = catalog.CatalogCache()
+    cache.load()
+
+    del items["a"]
+    assert cache.reconcile() == 1
+    _, unavailable, _, _ = cache.check_cart([line("a", 1, "2.50"), line("b")])
+    assert unavailable == ["a"]
+
+
+def test_refresh_stays_incremental(items, monkeypatch):
+    items["a"] = (Decimal("2.50"), T0)
+    cache = catalog.CatalogCache()
+    cache.load()
+
+    scans = []
+    monkeypatch.setattr(catalog, "fetch_item_ids", lambda: scans.append(1) or set(items))
+    del items["a"]
+    items["b"] = (Decimal("1.00"), T0 + timedelta(seconds=5))
+    cache.refresh()
+    assert scans == []
+    assert set(cache.items) == {"a", "b"}
+
+    cache.reconcile()
+    assert set(cache.items) == {"b"}
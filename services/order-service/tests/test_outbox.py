@@ -0,0 +1,67 @@
+import asyncio
+
+import outbox
+
+
+def run_relay(monkeypatch, batches, seconds=0.2):
+    """Run the relay loop briefly; returns how often stats were queried"""
+    stats_calls = []
+
+    def relay_batch(sink, batch_size):
+        return batches.pop(0) if batches else 0
+
+    def outbox_stats():
+        stats_calls.append(1)
+        return 0, None
+
+    async def run_db(func, *args):
+        return func(*args)
+
+    monkeypatch.setattr(outbox, "relay_batch", relay_batch)
+    monkeypatch.setattr(outbox, "outbox_stats", outbox_stats)
+    monkeypatch.setattr(outbox, "run_db", run_db)
+    monkeypatch.setattr(outbox.settings, "outbox_stats_interval", 60)
+
+    async def main():
+        relay = outbox.OutboxRelay(outbox.MemorySink(), 100, poll_interval=0.01)
+        relay.start()
+        await asyncio.sleep(seconds)
+        await relay.stop()
+
+    asyncio.run(main())
+    return len(stats_calls)
+
+
+def test_idle_relay_reads_stats_once(monkeypatch):
+    assert run_relay(monkeypatch, []) == 1
+
+
+def test_stats_refresh_after_each_published_batch(monkeypatch):
+    assert run_relay(monkeypatch, [5, 0, 3]) == 2
+
+
+def test_relay_errors_are_logged(monkeypatch):
+    logged = []
+    monkeypatch.setattr(
+        outbox, "log_event", lambda event, *args, **fields: logged.append(event)
+    )
+
+    def broken(sink, batch_size):
+        raise RuntimeError("broker down")
+
+    monkeypatch.setattr(outbox, "relay_batch", broken)
+
+    async def run_db(func, *args):
+        return func(*args)
+
+    monkeypatch.setattr(outbox, "run_db", run_db)
+    monkeypatch.setattr(outbox, "outbox_stats", lambda: (1, 2.0))
+
+    async def main():
+        relay = outbox.OutboxRelay(outbox.MemorySink(), 100, poll_interval=0.01)
+        relay.start()
+        await asyncio.sleep(0.05)
+        await relay.stop()
+
+    asyncio.run(main())
+    assert "outbox_relay_failed" in logged
@@ -0,0 +1,23 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from database import PoolTimeout, pool_timeout_handler
+
+
+def test_pool_timeout_is_a_retryable_503():
+    app = FastAPI()
+    app.add_exception_handler(PoolTimeout, pool_timeout_handler)
+
+    @app.get("/busy")
+    async def busy():
+        raise PoolTimeout("No database connection free after 5s")
+
+    response = TestClient(app).get("/busy")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_order_service_registers_the_handler():
+    from main import app
+
+    assert app.exception_handlers[PoolTimeout] is pool_timeout_handler
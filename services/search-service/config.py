@@ -4,14 +4,51 @@ from pydantic import Field
 
 class Settings(BaseSettings):
     database_url: str = Field(..., alias="DATABASE_URL")
+    db_pool_min_size: int = Field(1, alias="DB_POOL_MIN_SIZE")
+    db_pool_max_size: int = Field(10, alias="DB_POOL_MAX_SIZE")
+    db_pool_max_lifetime: float = Field(1800, alias="DB_POOL_MAX_LIFETIME")
+    db_pool_timeout: float = Field(5, alias="DB_POOL_TIMEOUT")
+    db_pool_ping_after: float = Field(30, alias="DB_POOL_PING_AFTER")
     model_name: str = Field(
         "sentence-transformers/all-MiniLM-L6-v2", alias="MODEL_NAME"
     )
+    embedding_backend: str = Field("torch", alias="EMBEDDING_BACKEND")
+    embedding_onnx_file: str | None = Field(None, alias="EMBEDDING_ONNX_FILE")
     service_name: str = Field("search-service", alias="SERVICE_NAME")
 
+    # Batched query inference
+    inference_max_batch_size: int = Field(32, alias="INFERENCE_MAX_BATCH_SIZE")
+    inference_max_wait_ms: float = Field(5, alias="INFERENCE_MAX_WAIT_MS")
+
+    # Search engine: "opensearch", or "local" for the in-process vector index
+    search_engine: str = Field("opensearch", alias="SEARCH_ENGINE")
+    local_index_fallback: bool = Field(True, alias="LOCAL_INDEX_FALLBACK")
+    local_index_path: str = Field("/tmp/vector-index", alias="LOCAL_INDEX_PATH")
+    local_index_nlist: int = Field(256, alias="LOCAL_INDEX_NLIST")
+    local_index_nprobe: int = Field(8, alias="LOCAL_INDEX_NPROBE")
+
+    # Search result and item caches
+    result_cache_max_entries: int = Field(10000, alias="RESULT_CACHE_MAX_ENTRIES")
+    result_cache_ttl: float = Field(60, alias="RESULT_CACHE_TTL")
+    item_cache_max_entries: int = Field(50000, alias="ITEM_CACHE_MAX_ENTRIES")
+    item_cache_ttl: float = Field(600, alias="ITEM_CACHE_TTL")
+    catalog_version_poll_seconds: float = Field(5, alias="CATALOG_VERSION_POLL_SECONDS")
+
+    # Query embedding cache
+    embedding_cache_max_bytes: int = Field(
+        64 * 1024 * 1024, alias="EMBEDDING_CACHE_MAX_BYTES"
+    )
+    embedding_cache_ttl: float = Field(3600, alias="EMBEDDING_CACHE_TTL")
+    embedding_cache_redis_url: str | None = Field(
+        None, alias="EMBEDDING_CACHE_REDIS_URL"
+    )
+
     opensearch_endpoint: str = Field(..., alias="OPENSEARCH_ENDPOINT")
     opensearch_username: str = Field(..., alias="OPENSEARCH_USERNAME")
     opensearch_password: str = Field(..., alias="OPENSEARCH_PASSWORD")
+    hybrid_search_pipeline: str = Field(
+        "hybrid-search", alias="HYBRID_SEARCH_PIPELINE"
+    )
 
     class Config:
         env_file = ".env"
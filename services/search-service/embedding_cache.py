@@ -0,0 +1,124 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+CACHE_HITS = Counter(
+    "embedding_cache_hits_total", "Query embeddings served from cache", ["tier"]
+)
+CACHE_MISSES = Counter(
+    "embedding_cache_misses_total", "Query embeddings that had to be computed"
+)
+CACHE_BYTES = Gauge("embedding_cache_bytes", "Bytes held by the local embedding cache")
+CACHE_ENTRIES = Gauge("embedding_cache_entries", "Entries in the local embedding cache")
+
+
+def normalize_query(q: str) -> str:
+    """Lower-case and collapse whitespace so trivially different queries share a key"""
+    return " ".join(q.lower().split())
+
+
+class EmbeddingCache:
+    """Byte-bounded LRU/TTL cache of query text -> float32 embedding.
+
+    When a Redis URL is given, misses fall through to a shared tier so all
+    search replicas reuse each other's work. Shared keys are prefixed with
+    `model` (the model@backend key), so replicas serving different models
+    never read each other's vectors.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        model: str,
+        shared_url: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.model = model
+        self._entries: "OrderedDict[str, tuple[float, np.ndarray]]" = OrderedDict()
+        self._bytes = 0
+        self._shared = None
+
+        if shared_url:
+            try:
+                import redis.asyncio as redis
+
+                self._shared = redis.from_url(
+                    shared_url, socket_timeout=0.05, socket_connect_timeout=0.2
+                )
+            except ImportError:
+                print("redis not installed, shared embedding cache disabled")
+
+    def _shared_key(self, key: str) -> str:
+        return f"emb:{self.model}:{key}"
+
+    @staticmethod
+    def _entry_size(key: str, vector: np.ndarray) -> int:
+        return vector.nbytes + len(key)
+
+    def _evict(self, key: str):
+        _, vector = self._entries.pop(key)
+        self._bytes -= self._entry_size(key, vector)
+
+    def _get_local(self, key: str) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, vector = entry
+        if expires_at <= time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return vector
+
+    def _put_local(self, key: str, vector: np.ndarray):
+        size = self._entry_size(key, vector)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (time.monotonic() + self.ttl, vector)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+        CACHE_BYTES.set(self._bytes)
+        CACHE_ENTRIES.set(len(self._entries))
+
+    async def get(self, key: str) -> Optional[np.ndarray]:
+        vector = self._get_local(key)
+        if vector is not None:
+            CACHE_HITS.labels(tier="local").inc()
+            return vector
+
+        if self._shared is not None:
+            try:
+                raw = await self._shared.get(self._shared_key(key))
+            except Exception as e:
+                print(f"Shared embedding cache error: {e}")
+                raw = None
+            if raw is not None:
+                vector = np.frombuffer(raw, dtype=np.float32)
+                self._put_local(key, vector)
+                CACHE_HITS.labels(tier="shared").inc()
+                return vector
+
+        CACHE_MISSES.inc()
+        return None
+
+    async def put(self, key: str, vector) -> np.ndarray:
+        vector = np.ascontiguousarray(vector, dtype=np.float32).reshape(-1)
+        vector.setflags(write=False)
+        self._put_local(key, vector)
+
+        if self._shared is not None:
+            try:
+                await self._shared.set(
+                    self._shared_key(key), vector.tobytes(), ex=int(self.ttl)
+                )
+            except Exception as e:
+                print(f"Shared embedding cache error: {e}")
+        return vector
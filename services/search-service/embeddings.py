@@ -0,0 +1,55 @@
+"""Embedding model loader shared by search-service and the ingestion Lambda.
+
+Keep this file identical in both places so query and item vectors come
+from the same model, backend and weights.
+"""
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# backend name -> (sentence-transformers backend, default ONNX weights file)
+BACKENDS = {
+    "torch": ("torch", None),
+    "onnx": ("onnx", "onnx/model.onnx"),
+    "onnx-int8": ("onnx", "onnx/model_quint8_avx2.onnx"),
+}
+
+# Stored vectors (item_vectors.embedding) are little-endian float32 bytes
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+def load_embedding_model(
+    model_name: str = DEFAULT_MODEL_NAME,
+    backend: str = "torch",
+    onnx_file: str | None = None,
+) -> SentenceTransformer:
+    """Load the sentence embedding model on the requested inference backend"""
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend {backend!r}, expected one of {sorted(BACKENDS)}"
+        )
+
+    st_backend, default_file = BACKENDS[backend]
+    if st_backend == "torch":
+        return SentenceTransformer(model_name)
+
+    return SentenceTransformer(
+        model_name,
+        backend=st_backend,
+        model_kwargs={"file_name": onnx_file or default_file},
+    )
+
+
+def model_key(model_name: str, backend: str) -> str:
+    """Names the vector space of stored embeddings (<model name>@<backend>)"""
+    return f"{model_name}@{backend}"
+
+
+def vector_to_bytes(vector) -> bytes:
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def vector_from_bytes(data) -> np.ndarray:
+    return np.frombuffer(data, dtype=VECTOR_DTYPE)
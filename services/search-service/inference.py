@@ -0,0 +1,102 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import numpy as np
+from prometheus_client import Gauge, Histogram
+
+QUEUE_DEPTH = Gauge("inference_queue_depth", "Queries waiting to be embedded")
+BATCH_SIZE = Histogram(
+    "inference_batch_size",
+    "Queries embedded per model call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+INFERENCE_LATENCY = Histogram(
+    "inference_batch_seconds",
+    "Wall time of one batched encode call",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+class BatchEncoder:
+    """Collects concurrent encode requests and runs them as one model call.
+
+    The first queued query opens a window of max_wait_ms; everything that
+    arrives before it closes (up to max_batch_size) is encoded together on
+    a dedicated thread, and each caller gets its own row back.
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5,
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+        self._worker = None
+
+    def start(self):
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def encode(self, text: str) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            batch = [(text, fut) for text, fut in batch if not fut.cancelled()]
+            if not batch:
+                continue
+
+            # Identical queries in the same window share one row
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            BATCH_SIZE.observe(len(texts))
+            started = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(
+                    self._executor, self.encode_batch, texts
+                )
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            finally:
+                INFERENCE_LATENCY.observe(time.perf_counter() - started)
+
+            rows = dict(zip(texts, vectors))
+            for text, fut in batch:
+                if not fut.done():
+                    fut.set_result(rows[text])
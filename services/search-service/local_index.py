@@ -0,0 +1,125 @@
+import os
+from typing import Callable, List, Optional
+
+import numpy as np
+from psycopg2.extras import RealDictCursor
+
+from config import settings
+from database import get_db_connection
+from embeddings import model_key, vector_from_bytes
+from vector_index import VectorIndex
+
+EncodeBatch = Callable[[List[str]], np.ndarray]
+
+METADATA_FIELDS = ("description", "price", "image_url", "s3_image_key")
+
+
+def serving_model_key() -> str:
+    return model_key(settings.model_name, settings.embedding_backend)
+
+
+def fetch_catalog(since=None):
+    """Items (with stored vectors for the serving model) updated after `since`"""
+    query = """
+        SELECT i.item_id, i.description, i.price, i.image_url, i.s3_image_key,
+               i.updated_at, v.embedding
+        FROM items i
+        LEFT JOIN item_vectors v
+            ON v.item_id = i.item_id AND v.model_name = %s
+    """
+    params = (serving_model_key(),)
+    if since is not None:
+        # Overlap the window so rows from transactions that committed after
+        # the last sync but carry an older timestamp are not missed.
+        # Re-adding an item just replaces it.
+        query += " WHERE i.updated_at > %s::timestamp - INTERVAL '60 seconds'"
+        params += (since,)
+    query += " ORDER BY i.updated_at"
+
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+def _embed_rows(rows, encode_batch: EncodeBatch) -> np.ndarray:
+    """Use stored vectors where available and encode the rest in batches"""
+    vectors: List[Optional[np.ndarray]] = [None] * len(rows)
+    missing = []
+    for i, row in enumerate(rows):
+        stored = row.get("embedding")
+        if stored is not None:
+            vectors[i] = vector_from_bytes(stored).astype(np.float32)
+        else:
+            missing.append(i)
+
+    for start in range(0, len(missing), 256):
+        chunk = missing[start : start + 256]
+        encoded = encode_batch([rows[i]["description"] for i in chunk])
+        for i, vector in zip(chunk, encoded):
+            vectors[i] = np.asarray(vector, dtype=np.float32)
+
+    return np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+
+def _metadata(row) -> dict:
+    meta = {field: row[field] for field in METADATA_FIELDS}
+    meta["price"] = float(meta["price"])
+    return meta
+
+
+def save(index: VectorIndex, watermark):
+    index.save(
+        settings.local_index_path,
+        info={"watermark": watermark, "model": serving_model_key()},
+    )
+
+
+def load_or_build(encode_batch: EncodeBatch):
+    """Load the persisted index if there is one, otherwise build it from Postgres.
+
+    Returns (index, watermark) where watermark is the newest items.updated_at
+    already reflected in the index. A persisted index built with another
+    model or backend (or before the model was recorded) is rebuilt, since
+    its vectors aren't comparable with the query embeddings.
+    """
+    path = settings.local_index_path
+    if os.path.exists(os.path.join(path, "items.jsonl")):
+        index = VectorIndex.load(path)
+        built_with = index.info.get("model")
+        if built_with == serving_model_key():
+            watermark = index.info.get("watermark")
+            print(f"Loaded local vector index with {len(index)} items from {path}")
+            return refresh(index, watermark, encode_batch)
+        print(
+            f"Local vector index at {path} was built with {built_with}, "
+            f"serving {serving_model_key()}; rebuilding"
+        )
+
+    rows = fetch_catalog()
+    if not rows:
+        return None, None
+    vectors = _embed_rows(rows, encode_batch)
+    index = VectorIndex.build(
+        [row["item_id"] for row in rows],
+        vectors,
+        [_metadata(row) for row in rows],
+        nlist=settings.local_index_nlist,
+    )
+    watermark = rows[-1]["updated_at"]
+    save(index, watermark)
+    print(f"Built local vector index with {len(index)} items ({index.nlist} lists)")
+    return index, watermark
+
+
+def refresh(index: VectorIndex, watermark, encode_batch: EncodeBatch):
+    """Insert items changed since the watermark into the in-memory index"""
+    rows = fetch_catalog(since=watermark)
+    if not rows:
+        return index, watermark
+
+    vectors = _embed_rows(rows, encode_batch)
+    index.add_many(
+        [row["item_id"] for row in rows], vectors, [_metadata(row) for row in rows]
+    )
+    return index, rows[-1]["updated_at"]
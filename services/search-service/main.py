@@ -1,15 +1,35 @@
+import asyncio
+import time
+
 from fastapi import FastAPI, HTTPException
+from pydantic import ValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from prometheus_fastapi_instrumentator import Instrumentator
-from sentence_transformers import SentenceTransformer
 from psycopg2.extras import RealDictCursor
 from opensearchpy import OpenSearch, RequestsHttpConnection
+from prometheus_client import Histogram
 
 from config import settings
-from database import get_db_connection
+from database import (
+    PoolTimeout,
+    close_pool,
+    get_db_connection,
+    init_pool,
+    pool_timeout_handler,
+    run_db,
+)
+from embeddings import load_embedding_model, model_key
+from embedding_cache import EmbeddingCache, normalize_query
+from inference import BatchEncoder
+from result_cache import TTLCache
+import local_index
+from models import ItemBatchRequest, SearchQuery
 
 app = FastAPI(title="Search Service", version="1.0.0")
 
+app.add_exception_handler(PoolTimeout, pool_timeout_handler)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -22,19 +42,68 @@ app.add_middleware(
 instrumentator = Instrumentator()
 instrumentator.instrument(app).expose(app)
 
+SEARCH_LATENCY = Histogram(
+    "search_latency_seconds",
+    "End-to-end /search latency by where the results came from",
+    ["source"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
 model = None
+batch_encoder = None
 opensearch_client = None
+catalog_watcher = None
+catalog_generation = None
+local_vector_index = None
+local_index_watermark = None
+local_index_task = None
+result_cache = TTLCache(
+    "search_results",
+    max_entries=settings.result_cache_max_entries,
+    ttl=settings.result_cache_ttl,
+)
+item_cache = TTLCache(
+    "items",
+    max_entries=settings.item_cache_max_entries,
+    ttl=settings.item_cache_ttl,
+)
+item_cache_watermark = None
+embedding_cache = EmbeddingCache(
+    max_bytes=settings.embedding_cache_max_bytes,
+    ttl=settings.embedding_cache_ttl,
+    model=model_key(settings.model_name, settings.embedding_backend),
+    shared_url=settings.embedding_cache_redis_url,
+)
 
 
 @app.on_event("startup")
 async def startup():
     global model
+    global batch_encoder
     global opensearch_client
+    global catalog_watcher
+    global local_index_task
     # init_db()
-    print("Loading BERT model...")
-    model = SentenceTransformer(settings.model_name)
+    try:
+        init_pool()
+    except Exception as e:
+        print(f"Database pool warm-up failed: {e}")
+
+    print(f"Loading BERT model ({settings.embedding_backend} backend)...")
+    model = load_embedding_model(
+        settings.model_name,
+        settings.embedding_backend,
+        settings.embedding_onnx_file,
+    )
     print("Model loaded!")
 
+    batch_encoder = BatchEncoder(
+        lambda texts: model.encode(texts, batch_size=len(texts)),
+        max_batch_size=settings.inference_max_batch_size,
+        max_wait_ms=settings.inference_max_wait_ms,
+    )
+    batch_encoder.start()
+
     print("Connecting to OpenSearch...")
     opensearch_client = OpenSearch(
         hosts=[{"host": settings.opensearch_endpoint, "port": 443}],
@@ -46,85 +115,386 @@ async def startup():
     )
     print("OpenSearch connected!")
 
+    catalog_watcher = asyncio.create_task(watch_catalog_version())
+
+    if settings.search_engine == "local" or settings.local_index_fallback:
+        local_index_task = asyncio.create_task(prepare_local_index())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if catalog_watcher is not None:
+        catalog_watcher.cancel()
+    if local_index_task is not None:
+        local_index_task.cancel()
+    if local_vector_index is not None and local_vector_index.dirty:
+        local_index.save(local_vector_index, local_index_watermark)
+    if batch_encoder is not None:
+        await batch_encoder.stop()
+    close_pool()
+
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": settings.service_name}
 
 
-@app.get("/search")
-async def search_items(q: str, limit: int = 10):
-    # Generate query embedding
-    query_embedding = model.encode(q).squeeze().tolist()
+def fetch_catalog_generation():
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT generation FROM catalog_version WHERE id = 1")
+            row = cur.fetchone()
+    return row[0] if row else 0
 
-    # k-NN search query
-    search_body = {
-        "size": limit,
-        "query": {"knn": {"embedding": {"vector": query_embedding, "k": limit}}},
-        "_source": ["item_id", "description", "price", "image_url", "s3_image_key"],
-    }
 
+def fetch_changed_item_ids(since):
+    """IDs of items upserted after `since` (with overlap), and the new watermark"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            if since is None:
+                cur.execute("SELECT max(updated_at) FROM items")
+                return [], cur.fetchone()[0]
+            cur.execute(
+                """
+                SELECT item_id, updated_at FROM items
+                WHERE updated_at > %s::timestamp - INTERVAL '60 seconds'
+                """,
+                (since,),
+            )
+            rows = cur.fetchall()
+    return [row[0] for row in rows], max((row[1] for row in rows), default=since)
+
+
+async def invalidate_changed_items():
+    global item_cache_watermark
+    if item_cache_watermark is None:
+        item_cache.clear()
+    item_ids, item_cache_watermark = await run_db(
+        fetch_changed_item_ids, item_cache_watermark
+    )
+    for item_id in item_ids:
+        item_cache.invalidate(item_id)
+
+
+def encode_descriptions(texts):
+    return model.encode(texts, batch_size=64)
+
+
+async def prepare_local_index():
+    global local_vector_index
+    global local_index_watermark
     try:
+        index, watermark = await run_in_threadpool(
+            local_index.load_or_build, encode_descriptions
+        )
+    except Exception as e:
+        print(f"Local vector index unavailable: {e}")
+        return
+    local_vector_index, local_index_watermark = index, watermark
+
+
+async def refresh_local_index():
+    global local_index_watermark
+    if local_vector_index is None:
+        return
+    _, local_index_watermark = await run_in_threadpool(
+        local_index.refresh,
+        local_vector_index,
+        local_index_watermark,
+        encode_descriptions,
+    )
+
+
+async def watch_catalog_version():
+    """Drop cached results and changed items whenever ingestion bumps the
+    catalog generation"""
+    global catalog_generation
+    while True:
+        try:
+            generation = await run_db(fetch_catalog_generation)
+            if generation != catalog_generation:
+                if catalog_generation is not None:
+                    print(f"Catalog generation {generation}, clearing caches")
+                    await refresh_local_index()
+                await invalidate_changed_items()
+                result_cache.clear()
+                catalog_generation = generation
+        except Exception as e:
+            print(f"Catalog version check failed: {e}")
+        await asyncio.sleep(settings.catalog_version_poll_seconds)
+
+
+async def get_query_embedding(q: str):
+    key = normalize_query(q)
+    vector = await embedding_cache.get(key)
+    if vector is None:
+        vector = await embedding_cache.put(key, await batch_encoder.encode(key))
+    return vector
+
+
+SOURCE_FIELDS = ["item_id", "description", "price", "image_url", "s3_image_key"]
+
+
+def _hit_to_result(hit) -> dict:
+    source = hit["_source"]
+    return {
+        "item_id": source["item_id"],
+        "description": source["description"],
+        "price": source["price"],
+        "image_url": source.get("image_url"),
+        "s3_image_key": source.get("s3_image_key"),
+        "score": hit["_score"],
+    }
+
+
+def search_opensearch(query: SearchQuery, query_embedding: list):
+    price_filter = query.price_filter()
+
+    # k-NN search query; the filter is applied inside the HNSW search (faiss
+    # engine), so pages stay full instead of being thinned afterwards
+    knn = {"vector": query_embedding, "k": query.depth}
+    if price_filter:
+        knn["filter"] = price_filter
+    knn_query = {"knn": {"embedding": knn}}
+
+    if query.mode == "vector":
+        search_body = {
+            "from": query.offset,
+            "size": query.limit,
+            "query": knn_query,
+            "_source": SOURCE_FIELDS,
+        }
         response = opensearch_client.search(index="items", body=search_body)
+        return [_hit_to_result(hit) for hit in response["hits"]["hits"]]
 
-        results = []
-        for hit in response["hits"]["hits"]:
-            source = hit["_source"]
-            results.append(
-                {
-                    "item_id": source["item_id"],
-                    "description": source["description"],
-                    "price": source["price"],
-                    "image_url": source.get("image_url"),
-                    "s3_image_key": source.get("s3_image_key"),
-                    "score": hit["_score"],
+    # Hybrid: BM25 (with exact item_id matches boosted) fused with k-NN by
+    # the normalization search pipeline. Hybrid queries don't support
+    # "from", so fetch through the requested page and slice.
+    lexical = {
+        "bool": {
+            "must": {
+                "multi_match": {
+                    "query": query.q,
+                    "fields": ["description", "item_id^3"],
                 }
+            }
+        }
+    }
+    if price_filter:
+        lexical["bool"]["filter"] = price_filter
+    search_body = {
+        "size": query.depth,
+        "query": {"hybrid": {"queries": [lexical, knn_query]}},
+        "_source": SOURCE_FIELDS,
+    }
+    response = opensearch_client.search(
+        index="items",
+        body=search_body,
+        params={"search_pipeline": settings.hybrid_search_pipeline},
+    )
+    hits = response["hits"]["hits"][query.offset : query.depth]
+    return [_hit_to_result(hit) for hit in hits]
+
+
+def search_local_index(query: SearchQuery, query_embedding):
+    if local_vector_index is None:
+        raise RuntimeError("Local vector index is not ready")
+    allowed = None
+    if query.min_price is not None or query.max_price is not None:
+        allowed = lambda meta: query.price_matches(meta["price"])  # noqa: E731
+    results = local_vector_index.search(
+        query_embedding,
+        query.depth,
+        nprobe=settings.local_index_nprobe,
+        allowed=allowed,
+    )
+    return results[query.offset :]
+
+
+def search_response(query: SearchQuery, results: list, search_method: str) -> dict:
+    return {
+        "query": query.q,
+        "results": results,
+        "count": len(results),
+        "offset": query.offset,
+        "next_offset": query.depth if len(results) == query.limit else None,
+        "search_method": search_method,
+    }
+
+
+@app.get("/search")
+async def search_items(
+    q: str,
+    limit: int = 10,
+    offset: int = 0,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    mode: str = "vector",
+):
+    try:
+        query = SearchQuery(
+            q=q,
+            limit=limit,
+            offset=offset,
+            min_price=min_price,
+            max_price=max_price,
+            mode=mode,
+        )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=422, detail=e.errors(include_url=False, include_context=False)
+        )
+
+    started = time.perf_counter()
+    cache_key = query.model_copy(update={"q": normalize_query(q)})
+    generation = catalog_generation
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        search_method, results = cached
+        SEARCH_LATENCY.labels(source="cache").observe(time.perf_counter() - started)
+        return search_response(query, results, search_method)
+
+    # Generate query embedding
+    query_embedding = await get_query_embedding(q)
+
+    try:
+        if settings.search_engine == "local":
+            search_method = "local_vector"
+            results = await run_in_threadpool(
+                search_local_index, query, query_embedding
+            )
+        else:
+            search_method = "hybrid" if query.mode == "hybrid" else "vector_similarity"
+            results = await run_in_threadpool(
+                search_opensearch, query, query_embedding.tolist()
             )
 
-        return {
-            "query": q,
-            "results": results,
-            "count": len(results),
-            "search_method": "vector_similarity",
-        }
+        # Skip caching if the catalog changed while this search was running
+        if generation == catalog_generation:
+            result_cache.put(cache_key, (search_method, results))
+        SEARCH_LATENCY.labels(source=search_method).observe(
+            time.perf_counter() - started
+        )
+
+        return search_response(query, results, search_method)
 
     except Exception as e:
-        print(f"OpenSearch error: {e}")
-        # Fallback to text search in RDS
-        return fallback_text_search(q, limit)
+        print(f"{settings.search_engine} search error: {e}")
+
+    # Semantic fallback from the in-process index, if it is loaded
+    if settings.search_engine != "local" and local_vector_index is not None:
+        results = await run_in_threadpool(search_local_index, query, query_embedding)
+        SEARCH_LATENCY.labels(source="local_fallback").observe(
+            time.perf_counter() - started
+        )
+        return search_response(query, results, "local_vector_fallback")
 
+    # Fallback to text search in RDS
+    results = await run_db(fallback_text_search, query)
+    SEARCH_LATENCY.labels(source="text_fallback").observe(
+        time.perf_counter() - started
+    )
+    return search_response(query, results, "text_fallback")
+
+
+def fallback_text_search(query: SearchQuery):
+    """Fallback to indexed Postgres text search if OpenSearch fails.
+
+    Ranked full-text search on items.search_vector first; if the query has
+    no full-word matches (typos, partial words), a trigram-indexed ILIKE
+    ranked by similarity. Price bounds use idx_items_price.
+    """
+    price_sql = ""
+    price_args = []
+    if query.min_price is not None:
+        price_sql += " AND price >= %s"
+        price_args.append(query.min_price)
+    if query.max_price is not None:
+        price_sql += " AND price <= %s"
+        price_args.append(query.max_price)
+
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                f"""
+                SELECT item_id, description, image_url, price,
+                       ts_rank_cd(search_vector, tsq) AS score
+                FROM items, websearch_to_tsquery('english', %s) AS tsq
+                WHERE search_vector @@ tsq{price_sql}
+                ORDER BY score DESC, item_id
+                LIMIT %s OFFSET %s
+                """,
+                (query.q, *price_args, query.limit, query.offset),
+            )
+            items = cur.fetchall()
+
+            if not items and query.offset == 0:
+                cur.execute(
+                    f"""
+                    SELECT item_id, description, image_url, price,
+                           similarity(description, %s) AS score
+                    FROM items
+                    WHERE description ILIKE %s{price_sql}
+                    ORDER BY score DESC, item_id
+                    LIMIT %s
+                    """,
+                    (query.q, f"%{query.q}%", *price_args, query.limit),
+                )
+                items = cur.fetchall()
+
+    return items
 
-def fallback_text_search(q: str, limit: int):
-    """Fallback to simple text search if OpenSearch fails"""
+
+def fetch_items(item_ids: list):
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
                 """
-                SELECT item_id, description, image_url, price
+                SELECT item_id, description, image_url, s3_image_key, price, created_at
                 FROM items
-                WHERE description ILIKE %s
-                LIMIT %s
+                WHERE item_id = ANY(%s)
                 """,
-                (f"%{q}%", limit),
+                (item_ids,),
             )
-            items = cur.fetchall()
+            return cur.fetchall()
 
-    return {
-        "query": q,
-        "results": items,
-        "count": len(items),
-        "search_method": "text_fallback",
-    }
+
+async def get_items_cached(item_ids: list) -> dict:
+    """Read-through lookup: cached rows first, one query for the rest"""
+    found = {}
+    missing = []
+    for item_id in dict.fromkeys(item_ids):
+        item = item_cache.get(item_id)
+        if item is not None:
+            found[item_id] = item
+        else:
+            missing.append(item_id)
+
+    if missing:
+        generation = catalog_generation
+        for item in await run_db(fetch_items, missing):
+            found[item["item_id"]] = item
+            # Don't cache rows read across an ingestion update
+            if generation == catalog_generation:
+                item_cache.put(item["item_id"], item)
+
+    return found
 
 
 @app.get("/items/{item_id}")
 async def get_item(item_id: str):
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM items WHERE item_id = %s", (item_id,))
-            item = cur.fetchone()
+    item = (await get_items_cached([item_id])).get(item_id)
 
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
 
     return item
+
+
+@app.post("/items:batchGet")
+async def batch_get_items(request: ItemBatchRequest):
+    found = await get_items_cached(request.item_ids)
+    return {
+        "items": [found[i] for i in dict.fromkeys(request.item_ids) if i in found],
+        "missing": [i for i in dict.fromkeys(request.item_ids) if i not in found],
+    }
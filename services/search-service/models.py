@@ -0,0 +1,51 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
+
+MAX_SEARCH_DEPTH = 1000
+MAX_BATCH_ITEMS = 100
+
+
+class SearchQuery(BaseModel, frozen=True):
+    q: str
+    limit: int = Field(10, ge=1, le=100)
+    offset: int = Field(0, ge=0)
+    min_price: Optional[float] = Field(None, ge=0)
+    max_price: Optional[float] = Field(None, ge=0)
+    mode: Literal["vector", "hybrid"] = "vector"
+
+    @model_validator(mode="after")
+    def check_window(self):
+        if self.offset + self.limit > MAX_SEARCH_DEPTH:
+            raise ValueError(f"offset + limit must not exceed {MAX_SEARCH_DEPTH}")
+        if (
+            self.min_price is not None
+            and self.max_price is not None
+            and self.min_price > self.max_price
+        ):
+            raise ValueError("min_price must not exceed max_price")
+        return self
+
+    @property
+    def depth(self) -> int:
+        return self.offset + self.limit
+
+    def price_filter(self) -> Optional[dict]:
+        """OpenSearch range filter for the requested price bounds"""
+        bounds = {}
+        if self.min_price is not None:
+            bounds["gte"] = self.min_price
+        if self.max_price is not None:
+            bounds["lte"] = self.max_price
+        return {"range": {"price": bounds}} if bounds else None
+
+    def price_matches(self, price) -> bool:
+        price = float(price)
+        if self.min_price is not None and price < self.min_price:
+            return False
+        if self.max_price is not None and price > self.max_price:
+            return False
+        return True
+
+
+class ItemBatchRequest(BaseModel):
+    item_ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
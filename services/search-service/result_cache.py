@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from prometheus_client import Counter, Gauge
+
+
+class TTLCache:
+    """Entry-bounded LRU with per-entry TTL and hit/miss metrics"""
+
+    def __init__(self, name: str, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._hits = Counter(f"{name}_cache_hits_total", f"{name} cache hits")
+        self._misses = Counter(f"{name}_cache_misses_total", f"{name} cache misses")
+        self._size = Gauge(f"{name}_cache_entries", f"Entries in the {name} cache")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits.inc()
+                return value
+            del self._entries[key]
+            self._size.set(len(self._entries))
+        self._misses.inc()
+        return None
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._size.set(len(self._entries))
+
+    def invalidate(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            self._size.set(len(self._entries))
+
+    def clear(self):
+        self._entries.clear()
+        self._size.set(0)
@@ -8,3 +8,44 @@ CREATE TABLE IF NOT EXISTS items (
 );
 
 CREATE INDEX IF NOT EXISTS idx_items_price ON items(price);
+
+-- Lets the local vector index pick up changed items incrementally
+ALTER TABLE items ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+CREATE INDEX IF NOT EXISTS idx_items_updated_at ON items(updated_at);
+
+-- Hash of description, price and image URL; ingestion skips unchanged items
+ALTER TABLE items ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+-- Indexed text search for the OpenSearch fallback. Adding the generated
+-- column computes it for every existing row (rewrites the table once).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+ALTER TABLE items ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED;
+CREATE INDEX IF NOT EXISTS idx_items_search_vector ON items USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_items_description_trgm ON items USING GIN (description gin_trgm_ops);
+
+CREATE TABLE IF NOT EXISTS item_embeddings (
+    item_id VARCHAR(100) PRIMARY KEY,
+    embedding_vector JSONB,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Item vectors as little-endian float32 bytes, one row per item and model
+-- ("<model name>@<backend>"), so indexes can be rebuilt without the model
+CREATE TABLE IF NOT EXISTS item_vectors (
+    item_id VARCHAR(100) NOT NULL,
+    model_name VARCHAR(200) NOT NULL,
+    dim INT NOT NULL,
+    embedding BYTEA NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (item_id, model_name)
+);
+
+-- Bumped by ingestion after items are (re)indexed; search caches key off it
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalog_version (id, generation) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,40 @@
+import asyncio
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+class SharedTier:
+    """In-memory stand-in for the Redis tier"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def replica(model, shared):
+    cache = EmbeddingCache(max_bytes=1 << 20, ttl=60, model=model)
+    cache._shared = shared
+    return cache
+
+
+def test_shared_tier_is_scoped_to_the_model():
+    shared = SharedTier()
+    minilm = replica("all-MiniLM-L6-v2@torch", shared)
+    peer = replica("all-MiniLM-L6-v2@torch", shared)
+    other = replica("all-mpnet-base-v2@onnx", shared)
+
+    async def run():
+        await minilm.put("blue kettle", np.ones(384))
+        return await peer.get("blue kettle"), await other.get("blue kettle")
+
+    same_model, other_model = asyncio.run(run())
+    assert same_model is not None and same_model.shape == (384,)
+    assert other_model is None
+    assert list(shared.data) == ["emb:all-MiniLM-L6-v2@torch:blue kettle"]
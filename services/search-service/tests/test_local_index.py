@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import local_index
+from config import settings
+
+DIM = 8
+
+
+@pytest.fixture
+def catalog(monkeypatch, tmp_path):
+    rng = np.random.default_rng(0)
+    rows = [
+        {
+            "item_id": f"item-{i}",
+            "description": f"item {i}",
+            "price": 1.0,
+            "image_url": None,
+            "s3_image_key": None,
+            "updated_at": datetime(2026, 1, 1),
+            "embedding": None,
+        }
+        for i in range(50)
+    ]
+    fetches = []
+
+    def fetch_catalog(since=None):
+        fetches.append(since)
+        return rows if since is None else []
+
+    monkeypatch.setattr(local_index, "fetch_catalog", fetch_catalog)
+    monkeypatch.setattr(settings, "local_index_path", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "model_name", "model-a")
+    monkeypatch.setattr(settings, "embedding_backend", "torch")
+    encode = lambda texts: rng.normal(size=(len(texts), DIM)).astype(np.float32)  # noqa: E731
+    return fetches, encode
+
+
+def test_persisted_index_is_reused_for_the_same_model(catalog):
+    fetches, encode = catalog
+    local_index.load_or_build(encode)
+    index, _ = local_index.load_or_build(encode)
+    assert len(index) == 50
+    # Built once, then only an incremental refresh from the watermark
+    assert fetches == [None, str(datetime(2026, 1, 1))]
+
+
+def test_model_switch_rebuilds_persisted_index(catalog):
+    fetches, encode = catalog
+    local_index.load_or_build(encode)
+
+    settings.embedding_backend = "onnx"
+    index, _ = local_index.load_or_build(encode)
+    assert len(index) == 50
+    assert fetches == [None, None]
+
+    reloaded = local_index.VectorIndex.load(settings.local_index_path)
+    assert reloaded.info["model"] == "model-a@onnx"
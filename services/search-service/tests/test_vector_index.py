@@ -0,0 +1,82 @@
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def clustered(n, dim=32, clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32) * 4
+    vectors = centers[rng.integers(0, clusters, n)]
+    vectors += rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors
+
+
+def build(n, nlist=16, dim=32):
+    vectors = clustered(n, dim)
+    ids = [f"item-{i}" for i in range(n)]
+    meta = [{"price": float(i % 100)} for i in range(n)]
+    return VectorIndex.build(ids, vectors, meta, nlist=nlist), vectors
+
+
+def test_add_many_matches_single_adds():
+    vectors = clustered(500)
+    one, many = VectorIndex(32), VectorIndex(32)
+    for i, vector in enumerate(vectors):
+        one.add(f"item-{i}", vector, {"price": 1.0})
+    many.add_many(
+        [f"item-{i}" for i in range(len(vectors))], vectors, [{"price": 1.0}] * 500
+    )
+    for query in vectors[:20]:
+        assert [r["item_id"] for r in one.search(query, 5)] == [
+            r["item_id"] for r in many.search(query, 5)
+        ]
+
+
+def test_tail_capacity_grows_geometrically():
+    index = VectorIndex(32)
+    capacities = set()
+    for i, vector in enumerate(clustered(3000)):
+        index.add(f"item-{i}", vector, {})
+        capacities.add(len(index._tail))
+    assert len(capacities) <= 7
+    assert len(index._tail) < 2 * 3000
+
+
+def test_replaced_item_returns_latest_vector(tmp_path):
+    index, vectors = build(1000)
+    index.add("item-0", vectors[500], {"price": 5.0})
+    top = index.search(vectors[500], 2)
+    assert {r["item_id"] for r in top} == {"item-0", "item-500"}
+    assert all(r["item_id"] != "item-0" or r["price"] == 5.0 for r in top)
+
+    index.save(str(tmp_path / "index"))
+    loaded = VectorIndex.load(str(tmp_path / "index"))
+    assert len(loaded) == 1000
+    assert {r["item_id"] for r in loaded.search(vectors[500], 2)} == {
+        "item-0",
+        "item-500",
+    }
+
+
+def test_filtered_search_widens_probe_to_fill_k():
+    index, vectors = build(4000, nlist=32)
+    # Matches are spread over every list, so the closest list alone
+    # holds only a few of them
+    allowed = lambda meta: meta["price"] < 3  # noqa: E731
+    matching = sum(1 for i in range(4000) if i % 100 < 3)
+
+    results = index.search(vectors[0], 10, nprobe=1, allowed=allowed)
+    assert len(results) == 10
+    assert all(r["price"] < 3 for r in results)
+
+    # Asking for more than exist returns every match after a full scan
+    results = index.search(vectors[0], matching + 5, nprobe=1, allowed=allowed)
+    assert len(results) == matching
+
+
+def test_probe_widening_keeps_nearest_first():
+    index, vectors = build(4000, nlist=32)
+    allowed = lambda meta: meta["price"] < 3  # noqa: E731
+    results = index.search(vectors[0], 10, nprobe=1, allowed=allowed)
+    scores = [r["score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
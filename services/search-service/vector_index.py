@@ -0,0 +1,314 @@
+"""In-process IVF-flat vector index for local / fallback semantic search.
+
+Item vectors live in one float32 matrix that is memory-mapped from disk
+when the index is loaded, so a pod can start serving without re-encoding
+the catalog. A k-means coarse quantizer splits the matrix into `nlist`
+inverted lists and a query only scans the `nprobe` closest lists. Items
+added after the build go to an in-memory tail that is scanned in full
+and folded into the matrix on the next save(). The tail is a
+preallocated buffer that doubles when full, so inserts stay amortized
+O(1) however many arrive between saves.
+
+Distances are squared L2, matching the `l2` space of the OpenSearch
+index, and scores use the same 1 / (1 + d) transform.
+"""
+
+import json
+import os
+import shutil
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+CHUNK_ROWS = 8192
+MIN_TAIL_CAPACITY = 64
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        chunk = np.asarray(vectors[start : start + CHUNK_ROWS], dtype=np.float32)
+        dists = centroid_norms - 2 * chunk @ centroids.T
+        out[start : start + len(chunk)] = np.argmin(dists, axis=1)
+    return out
+
+
+def _row_norms(vectors: np.ndarray) -> np.ndarray:
+    out = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        chunk = np.asarray(vectors[start : start + CHUNK_ROWS], dtype=np.float32)
+        out[start : start + len(chunk)] = np.einsum("ij,ij->i", chunk, chunk)
+    return out
+
+
+def train_centroids(
+    vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """Plain k-means on a sample of the matrix"""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_idx = np.sort(rng.choice(n, size=min(n, nlist * 64), replace=False))
+    sample = np.asarray(vectors[sample_idx], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = _nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class VectorIndex:
+    def __init__(
+        self,
+        dim: int,
+        vectors: Optional[np.ndarray] = None,
+        item_ids: Optional[List[str]] = None,
+        metadata: Optional[List[dict]] = None,
+        centroids: Optional[np.ndarray] = None,
+        assignments: Optional[np.ndarray] = None,
+        norms: Optional[np.ndarray] = None,
+    ):
+        self.dim = dim
+        self._base = (
+            vectors if vectors is not None else np.empty((0, dim), dtype=np.float32)
+        )
+        self._base_norms = norms if norms is not None else _row_norms(self._base)
+        self._ids: List[str] = list(item_ids or [])
+        self._meta: List[dict] = list(metadata or [])
+        self._rows: Dict[str, int] = {item_id: i for i, item_id in enumerate(self._ids)}
+
+        self.centroids = centroids
+        self._list_order = None
+        self._list_offsets = None
+        if centroids is not None and assignments is not None:
+            self._list_order = np.argsort(assignments, kind="stable")
+            self._list_offsets = np.searchsorted(
+                assignments[self._list_order], np.arange(len(centroids) + 1)
+            )
+
+        # Rows [0, _tail_n) of the buffers are live; the rest is spare capacity
+        self._tail = np.empty((0, dim), dtype=np.float32)
+        self._tail_norms = np.empty(0, dtype=np.float32)
+        self._tail_n = 0
+        self._lock = threading.Lock()
+        self.dirty = False
+        self.info: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    @classmethod
+    def build(
+        cls,
+        item_ids: List[str],
+        vectors: np.ndarray,
+        metadata: List[dict],
+        nlist: int = 256,
+    ) -> "VectorIndex":
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        # Each list should hold a few dozen vectors for k-means to be worth it
+        nlist = min(nlist, len(vectors) // 32)
+        if nlist < 2:
+            return cls(dim, vectors, item_ids, metadata)
+        centroids = train_centroids(vectors, nlist)
+        assignments = _nearest_centroids(vectors, centroids)
+        return cls(dim, vectors, item_ids, metadata, centroids, assignments)
+
+    def _reserve_tail(self, extra: int):
+        needed = self._tail_n + extra
+        if needed <= len(self._tail):
+            return
+        capacity = max(needed, 2 * len(self._tail), MIN_TAIL_CAPACITY)
+        tail = np.empty((capacity, self.dim), dtype=np.float32)
+        tail[: self._tail_n] = self._tail[: self._tail_n]
+        norms = np.empty(capacity, dtype=np.float32)
+        norms[: self._tail_n] = self._tail_norms[: self._tail_n]
+        # Searches holding views of the old buffers keep reading them safely
+        self._tail, self._tail_norms = tail, norms
+
+    def add(self, item_id: str, vector, metadata: dict):
+        """Insert or replace one item; replaced rows are skipped at query time"""
+        self.add_many([item_id], [vector], [metadata])
+
+    def add_many(self, item_ids: List[str], vectors, metadata: List[dict]):
+        """Insert or replace a batch of items with one copy into the tail"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) != len(item_ids) or len(item_ids) != len(metadata):
+            raise ValueError("item_ids, vectors and metadata differ in length")
+        with self._lock:
+            self._reserve_tail(len(vectors))
+            start, end = self._tail_n, self._tail_n + len(vectors)
+            self._tail[start:end] = vectors
+            self._tail_norms[start:end] = np.einsum("ij,ij->i", vectors, vectors)
+            for item_id, meta in zip(item_ids, metadata):
+                self._rows[item_id] = len(self._ids)
+                self._ids.append(item_id)
+                self._meta.append(meta)
+            self._tail_n = end
+            self.dirty = True
+
+    def search(
+        self,
+        query,
+        k: int,
+        nprobe: int = 8,
+        allowed: Optional[Callable[[dict], bool]] = None,
+    ) -> List[dict]:
+        """Top-k items nearest to `query`.
+
+        `allowed` is checked against item metadata before ranking. A
+        selective filter can leave the `nprobe` closest lists with fewer
+        than k matches, so a short result is retried with twice the lists,
+        up to a full scan; fewer than k come back only when fewer than k
+        items match at all.
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        while True:
+            results = self._search(query, k, nprobe, allowed)
+            if len(results) >= k or self.centroids is None or nprobe >= self.nlist:
+                return results
+            nprobe = min(2 * nprobe, self.nlist)
+
+    def _search(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int,
+        allowed: Optional[Callable[[dict], bool]],
+    ) -> List[dict]:
+        query_norm = float(query @ query)
+
+        with self._lock:
+            tail = self._tail[: self._tail_n]
+            tail_norms = self._tail_norms[: self._tail_n]
+            ids = self._ids
+            rows_by_id = self._rows
+
+        base_n = len(self._base)
+        if self.centroids is not None and nprobe < self.nlist:
+            centroid_dists = np.einsum(
+                "ij,ij->i", self.centroids, self.centroids
+            ) - 2 * (self.centroids @ query)
+            probe = np.argpartition(centroid_dists, nprobe)[:nprobe]
+            base_rows = np.concatenate(
+                [
+                    self._list_order[self._list_offsets[c] : self._list_offsets[c + 1]]
+                    for c in probe
+                ]
+            )
+            base_rows.sort()
+        else:
+            base_rows = np.arange(base_n)
+
+        dists = [
+            self._base_norms[base_rows]
+            - 2 * (np.asarray(self._base[base_rows]) @ query)
+            + query_norm
+        ]
+        rows = [base_rows]
+        if len(tail):
+            dists.append(tail_norms - 2 * (tail @ query) + query_norm)
+            rows.append(np.arange(base_n, base_n + len(tail)))
+        dists = np.concatenate(dists)
+        rows = np.concatenate(rows)
+        if allowed is not None:
+            keep = np.fromiter(
+                (allowed(self._meta[r]) for r in rows), dtype=bool, count=len(rows)
+            )
+            dists, rows = dists[keep], rows[keep]
+
+        # Over-fetch by the number of replaced rows so filtering can't starve k
+        fetch = min(len(rows), k + (len(ids) - len(rows_by_id)))
+        if fetch == 0:
+            return []
+        top = np.argpartition(dists, fetch - 1)[:fetch]
+        top = top[np.argsort(dists[top])]
+
+        results = []
+        for i in top:
+            row = int(rows[i])
+            item_id = ids[row]
+            if rows_by_id.get(item_id) != row:
+                continue
+            score = 1 / (1 + max(float(dists[i]), 0.0))
+            results.append({**self._meta[row], "item_id": item_id, "score": score})
+            if len(results) == k:
+                break
+        return results
+
+    def save(self, path: str, info: Optional[dict] = None):
+        """Write a compacted copy of the index; the directory is replaced atomically.
+
+        `info` is stored alongside the vectors and restored as `.info` on load.
+        """
+        with self._lock:
+            live = sorted(self._rows.values())
+            base_n = len(self._base)
+            base_live = [r for r in live if r < base_n]
+            tail_live = [r - base_n for r in live if r >= base_n]
+            vectors = np.concatenate(
+                [
+                    np.asarray(self._base[base_live], dtype=np.float32),
+                    self._tail[: self._tail_n][tail_live],
+                ]
+            )
+            items = [{"item_id": self._ids[r], **self._meta[r]} for r in live]
+            self.dirty = False
+
+        tmp = f"{path}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, "vectors.npy"), vectors)
+        np.save(os.path.join(tmp, "norms.npy"), _row_norms(vectors))
+        if self.centroids is not None:
+            np.save(os.path.join(tmp, "centroids.npy"), self.centroids)
+            np.save(
+                os.path.join(tmp, "assignments.npy"),
+                _nearest_centroids(vectors, self.centroids),
+            )
+        with open(os.path.join(tmp, "items.jsonl"), "w") as f:
+            for item in items:
+                f.write(json.dumps(item, default=str) + "\n")
+        with open(os.path.join(tmp, "info.json"), "w") as f:
+            json.dump(info or {}, f, default=str)
+
+        old = f"{path}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        norms = np.load(os.path.join(path, "norms.npy"))
+        centroids = assignments = None
+        if os.path.exists(os.path.join(path, "centroids.npy")):
+            centroids = np.load(os.path.join(path, "centroids.npy"))
+            assignments = np.load(os.path.join(path, "assignments.npy"))
+
+        item_ids, metadata = [], []
+        with open(os.path.join(path, "items.jsonl")) as f:
+            for line in f:
+                item = json.loads(line)
+                item_ids.append(item.pop("item_id"))
+                metadata.append(item)
+
+        index = cls(
+            vectors.shape[1], vectors, item_ids, metadata, centroids, assignments, norms
+        )
+        with open(os.path.join(path, "info.json")) as f:
+            index.info = json.load(f)
+        return index
@@ -5,12 +5,22 @@ from pydantic import Field
 class Settings(BaseSettings):
     # Database
     database_url: str = Field(..., alias="DATABASE_URL")
+    db_pool_min_size: int = Field(1, alias="DB_POOL_MIN_SIZE")
+    db_pool_max_size: int = Field(10, alias="DB_POOL_MAX_SIZE")
+    db_pool_max_lifetime: float = Field(1800, alias="DB_POOL_MAX_LIFETIME")
+    db_pool_timeout: float = Field(5, alias="DB_POOL_TIMEOUT")
+    db_pool_ping_after: float = Field(30, alias="DB_POOL_PING_AFTER")
 
     # JWT
     jwt_secret: str = Field(..., alias="JWT_SECRET")
     jwt_algorithm: str = Field("HS256", alias="JWT_ALGORITHM")
     jwt_expiration_hours: int = Field(24, alias="JWT_EXPIRATION_HOURS")
 
+    # Password hashing
+    bcrypt_rounds: int = Field(12, alias="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(2, alias="PASSWORD_HASH_WORKERS")
+    password_hash_queue_limit: int = Field(32, alias="PASSWORD_HASH_QUEUE_LIMIT")
+
     # Service
     service_name: str = Field("user-service", alias="SERVICE_NAME")
 
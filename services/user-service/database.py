@@ -1,19 +1,240 @@
-import psycopg2
+import functools
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
+
+import anyio
+import psycopg2
+from psycopg2 import extensions
+from prometheus_client import Gauge
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
 from config import settings
 
+POOL_IN_USE = Gauge("db_pool_connections_in_use", "Connections checked out of the pool")
+POOL_IDLE = Gauge("db_pool_connections_idle", "Open connections waiting in the pool")
+POOL_WAITING = Gauge("db_pool_waiting", "Callers blocked waiting for a free connection")
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool with bounded size and connection lifetime"""
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int,
+        max_size: int,
+        max_lifetime: float,
+        timeout: float,
+        ping_after: float,
+    ):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.ping_after = ping_after
+
+        self._idle = deque()  # (conn, created_at, returned_at)
+        self._created = {}  # id(conn) -> created_at, for checked-out connections
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        return psycopg2.connect(self.dsn), time.monotonic()
+
+    def _update_gauges(self):
+        POOL_IDLE.set(len(self._idle))
+        POOL_IN_USE.set(self._size - len(self._idle))
+
+    def _is_healthy(self, conn, created_at: float, returned_at: float) -> bool:
+        now = time.monotonic()
+        if conn.closed or now - created_at > self.max_lifetime:
+            return False
+        status = conn.info.transaction_status
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if now - returned_at > self.ping_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._update_gauges()
+            self._cond.notify()
+
+    def warm(self):
+        """Open connections up to min_size"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn, created_at = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, created_at, created_at))
+                self._update_gauges()
+                self._cond.notify()
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = None
+            with self._cond:
+                waiting = False
+                try:
+                    while not self._idle and self._size >= self.max_size:
+                        if not waiting:
+                            POOL_WAITING.inc()
+                            waiting = True
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeout(
+                                f"No database connection free after {self.timeout}s"
+                            )
+                        self._cond.wait(remaining)
+                finally:
+                    if waiting:
+                        POOL_WAITING.dec()
+
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+                self._update_gauges()
+
+            if entry is None:
+                try:
+                    conn, created_at = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._update_gauges()
+                        self._cond.notify()
+                    raise
+                self._created[id(conn)] = created_at
+                return conn
+
+            conn, created_at, returned_at = entry
+            if self._is_healthy(conn, created_at, returned_at):
+                self._created[id(conn)] = created_at
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn, discard: bool = False):
+        created_at = self._created.pop(id(conn), 0.0)
+        if discard or conn.closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._update_gauges()
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                conn.close()
+                self._size -= 1
+            self._update_gauges()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    settings.database_url,
+                    min_size=settings.db_pool_min_size,
+                    max_size=settings.db_pool_max_size,
+                    max_lifetime=settings.db_pool_max_lifetime,
+                    timeout=settings.db_pool_timeout,
+                    ping_after=settings.db_pool_ping_after,
+                )
+    return _pool
+
+
+def init_pool():
+    """Open the minimum number of pooled connections"""
+    get_pool().warm()
+
+
+def close_pool():
+    if _pool is not None:
+        _pool.close()
+
 
 @contextmanager
 def get_db_connection():
-    conn = psycopg2.connect(settings.database_url)
+    pool = get_pool()
+    conn = pool.getconn()
+    discard = False
     try:
         yield conn
         conn.commit()
     except Exception as e:
-        conn.rollback()
+        discard = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            discard = True
         raise e
     finally:
-        conn.close()
+        pool.putconn(conn, discard=discard)
+
+
+_limiter = None
+
+
+async def run_db(func, *args, **kwargs):
+    """Run blocking database work on a worker thread.
+
+    Concurrency is capped at the pool size so queries queue here, off the
+    event loop, rather than inside the pool.
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(settings.db_pool_max_size)
+    return await anyio.to_thread.run_sync(
+        functools.partial(func, *args, **kwargs), limiter=_limiter
+    )
+
+
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    """Answer 503 with Retry-After when the pool is exhausted, so clients
+    back off and retry instead of treating it as a server error"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
 
 
 def init_db():
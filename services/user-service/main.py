@@ -2,18 +2,27 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 from datetime import datetime, timedelta
-import bcrypt
 import jwt
 from psycopg2.extras import RealDictCursor
 from psycopg2.errorcodes import UNIQUE_VIOLATION
 from psycopg2 import errors
 
 from config import settings
-from database import get_db_connection
+from database import (
+    PoolTimeout,
+    close_pool,
+    get_db_connection,
+    init_pool,
+    pool_timeout_handler,
+    run_db,
+)
+import passwords
 from models import UserCreate, UserLogin, UserResponse, TokenResponse
 
 app = FastAPI(title="User Service", version="1.0.0")
 
+app.add_exception_handler(PoolTimeout, pool_timeout_handler)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,7 +39,16 @@ instrumentator.instrument(app).expose(app)
 @app.on_event("startup")
 async def startup():
     # init_db()
-    pass
+    try:
+        init_pool()
+    except Exception as e:
+        print(f"Database pool warm-up failed: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    close_pool()
+    passwords.shutdown()
 
 
 @app.get("/health")
@@ -38,24 +56,59 @@ async def health_check():
     return {"status": "healthy", "service": settings.service_name}
 
 
+def create_user(email: str, password_hash: str, name: str):
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                INSERT INTO users (email, password_hash, name)
+                VALUES (%s, %s, %s)
+                RETURNING user_id, email, name, created_at
+                """,
+                (email, password_hash, name),
+            )
+            return cur.fetchone()
+
+
+def fetch_user_by_email(email: str):
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                "SELECT user_id, email, password_hash, name, created_at FROM users WHERE email = %s",
+                (email,),
+            )
+            return cur.fetchone()
+
+
+def update_password_hash(user_id: str, password_hash: str):
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE users SET password_hash = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = %s
+                """,
+                (password_hash, user_id),
+            )
+
+
+def fetch_user_by_id(user_id: str):
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                "SELECT user_id, email, name, created_at FROM users WHERE user_id = %s",
+                (user_id,),
+            )
+            return cur.fetchone()
+
+
 @app.post("/register", response_model=TokenResponse)
 async def register(user: UserCreate):
     # Hash password
-    password_hash = bcrypt.hashpw(
-        user.password.encode(), bcrypt.gensalt()).decode()
+    password_hash = await passwords.hash_password(user.password)
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    """
-                    INSERT INTO users (email, password_hash, name)
-                    VALUES (%s, %s, %s)
-                    RETURNING user_id, email, name, created_at
-                    """,
-                    (user.email, password_hash, user.name),
-                )
-                user_data = cur.fetchone()
+        user_data = await run_db(create_user, user.email, password_hash, user.name)
 
         # Generate JWT
         token = generate_token(str(user_data["user_id"]))
@@ -77,23 +130,27 @@ async def register(user: UserCreate):
 
 @app.post("/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT user_id, email, password_hash, name, created_at FROM users WHERE email = %s",
-                (credentials.email,),
-            )
-            user_data = cur.fetchone()
+    user_data = await run_db(fetch_user_by_email, credentials.email)
 
     if not user_data:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     # Verify password
-    if not bcrypt.checkpw(
-        credentials.password.encode(), user_data["password_hash"].encode()
+    if not await passwords.verify_password(
+        credentials.password, user_data["password_hash"]
     ):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    # Upgrade hashes made with a different work factor while we have the password.
+    # Best effort: the password already checked out, so a failure here
+    # must not fail the login
+    if passwords.needs_rehash(user_data["password_hash"]):
+        try:
+            new_hash = await passwords.hash_password(credentials.password)
+            await run_db(update_password_hash, str(user_data["user_id"]), new_hash)
+        except Exception as e:
+            print(f"Password rehash failed for user {user_data['user_id']}: {e}")
+
     # Generate JWT
     token = generate_token(str(user_data["user_id"]))
 
@@ -110,13 +167,7 @@ async def login(credentials: UserLogin):
 
 @app.get("/profile/{user_id}", response_model=UserResponse)
 async def get_profile(user_id: str):
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT user_id, email, name, created_at FROM users WHERE user_id = %s",
-                (user_id,),
-            )
-            user_data = cur.fetchone()
+    user_data = await run_db(fetch_user_by_id, user_id)
 
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
@@ -0,0 +1,82 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException
+from prometheus_client import Gauge, Histogram
+
+from config import settings
+
+HASH_LATENCY = Histogram(
+    "password_hash_seconds",
+    "Time spent in bcrypt on a worker thread",
+    ["operation"],
+    buckets=(0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds",
+    "Time a hashing job waited for a free worker",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth", "Hashing jobs queued or running on the pool"
+)
+
+# bcrypt releases the GIL while hashing, so threads are enough to keep the
+# event loop (and /health) responsive.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt"
+)
+_pending = 0
+
+
+async def _submit(operation: str, func, *args):
+    global _pending
+    if _pending >= settings.password_hash_queue_limit:
+        raise HTTPException(status_code=503, detail="Server busy, try again later")
+
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        QUEUE_WAIT.observe(started - submitted)
+        try:
+            return func(*args)
+        finally:
+            HASH_LATENCY.labels(operation=operation).observe(
+                time.perf_counter() - started
+            )
+
+    _pending += 1
+    QUEUE_DEPTH.set(_pending)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, job)
+    finally:
+        _pending -= 1
+        QUEUE_DEPTH.set(_pending)
+
+
+async def hash_password(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=settings.bcrypt_rounds)
+    hashed = await _submit("hash", bcrypt.hashpw, password.encode(), salt)
+    return hashed.decode()
+
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    return await _submit(
+        "verify", bcrypt.checkpw, password.encode(), password_hash.encode()
+    )
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """True when the stored hash was made with a different work factor"""
+    try:
+        rounds = int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.bcrypt_rounds
+
+
+def shutdown():
+    _executor.shutdown(wait=False)
@@ -0,0 +1,53 @@
+from datetime import datetime
+from uuid import uuid4
+
+import bcrypt
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from config import settings
+
+
+@pytest.fixture
+def user(monkeypatch):
+    # Hashed with fewer rounds than configured, so login wants to rehash it
+    password_hash = bcrypt.hashpw(b"hunter22", bcrypt.gensalt(rounds=4)).decode()
+    row = {
+        "user_id": str(uuid4()),
+        "email": "ada@example.com",
+        "name": "Ada",
+        "password_hash": password_hash,
+        "created_at": datetime(2026, 1, 1),
+    }
+    monkeypatch.setattr(main, "fetch_user_by_email", lambda email: row)
+    monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+    return row
+
+
+def test_login_survives_failed_rehash(user, monkeypatch):
+    def broken_update(user_id, password_hash):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(main, "update_password_hash", broken_update)
+    response = TestClient(main.app).post(
+        "/login", json={"email": "ada@example.com", "password": "hunter22"}
+    )
+    assert response.status_code == 200
+    claims = jwt.decode(
+        response.json()["access_token"], "test-secret", algorithms=["HS256"]
+    )
+    assert claims["user_id"] == user["user_id"]
+
+
+def test_login_rehashes_weak_hash(user, monkeypatch):
+    updates = []
+    monkeypatch.setattr(
+        main, "update_password_hash", lambda *args: updates.append(args)
+    )
+    response = TestClient(main.app).post(
+        "/login", json={"email": "ada@example.com", "password": "hunter22"}
+    )
+    assert response.status_code == 200
+    assert len(updates) == 1 and updates[0][1].startswith("$2b$05$")
@@ -39,6 +39,8 @@ resource "aws_lambda_function" "ingestion" {
       OPENSEARCH_PASSWORD = var.opensearch_password
 
       # VARIABLES FOR BERT MODEL
+      MODEL_NAME        = "sentence-transformers/all-MiniLM-L6-v2"
+      EMBEDDING_BACKEND = var.embedding_backend
       HF_HOME = "/tmp"
       TRANSFORMERS_CACHE = "/tmp"
       SENTENCE_TRANSFORMERS_HOME = "/tmp"
@@ -110,5 +112,13 @@ resource "aws_s3_bucket_notification" "ingestion_trigger" {
     filter_suffix       = ".json"
   }
 
+  # Batched JSONL manifests written by scripts/seed_data.py --batch-size
+  lambda_function {
+    lambda_function_arn = aws_lambda_function.ingestion.arn
+    events              = ["s3:ObjectCreated:*"]
+    filter_prefix       = "manifests/"
+    filter_suffix       = ".jsonl"
+  }
+
   depends_on = [aws_lambda_permission.allow_s3]
 }
@@ -34,3 +34,9 @@ variable "opensearch_password" {
   sensitive = true
   default   = "OpenSearch123!"
 }
+
+variable "embedding_backend" {
+  description = "Embedding inference backend (torch, onnx, onnx-int8); must match search-service"
+  type        = string
+  default     = "torch"
+}